@@ -1,13 +1,28 @@
 
 import os
-from flask import Flask, jsonify, request, current_app, session 
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, OperationFailure
+import io
+import re
+import csv
+import json
+import heapq
+import unicodedata
+from bisect import bisect_left
+import threading
+import time
+from collections import deque, OrderedDict
+from functools import lru_cache
+import click
+import numpy as np
+import requests
+from flask import Flask, Response, jsonify, request, current_app, session, g, stream_with_context
+from werkzeug.middleware.proxy_fix import ProxyFix
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import ConnectionFailure, OperationFailure, ExecutionTimeout
 from dotenv import load_dotenv 
 import bcrypt 
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
-from math import ceil 
+from math import ceil, isfinite 
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -25,6 +40,141 @@ app = Flask(__name__)
 
 MOVIES_PER_PAGE_DEFAULT = 20 
 
+QUERY_TIME_BUDGET_MS = {
+    "movies": 3000,
+    "movie_detail": 1500,
+    "featured": 1500,
+    "comments": 1500,
+    "saved_movies": 2000,
+    "auth": 1000,
+    "user_loader": 1000,
+    "similar": 1000,
+    "semantic": 1000,
+}
+
+BREAKER_WINDOW_SECONDS = 30
+BREAKER_MIN_REQUESTS = 20
+BREAKER_ERROR_RATE = 0.5
+BREAKER_COOLDOWN_SECONDS = 15
+
+STALE_CACHE_MAX_ENTRIES = 512
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+# Shed load before requests start queueing for a pooled connection.
+MAX_IN_FLIGHT_REQUESTS = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", str(int(MONGO_MAX_POOL_SIZE * 0.8))))
+
+# (bucket capacity, tokens refilled per second) per route group
+RATE_LIMITS = {
+    "search": (20, 5.0),
+    "auth": (5, 0.2),
+    "write": (30, 1.0),
+}
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Number of proxies in front of Flask that append to X-Forwarded-For (e.g. 1 behind
+# the Next.js dev rewrite or Vercel). Only entries they appended are trusted; the
+# client controls everything to their left.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+RATE_LIMIT_MAX_KEYS = 10000
+# The shared backend sits in front of every limited request, so it gets a tight budget.
+RATE_LIMIT_BACKEND_TIMEOUT_MS = 50
+RATE_LIMIT_BUCKET_TTL_SECONDS = 3600
+
+# sort param -> (field, default direction)
+MOVIE_SORT_FIELDS = {
+    "rating": ("imdb.rating", -1),
+    "year": ("year", -1),
+    "title": ("title", 1),
+    "released": ("released", -1),
+}
+
+# Indexes /api/movies is allowed to lean on; `flask --app api/index create-indexes` builds them.
+MOVIE_QUERY_INDEXES = [
+    [("imdb.rating", -1)],
+    [("year", -1)],
+    [("title", 1)],
+    [("released", -1)],
+    [("genres", 1), ("imdb.rating", -1)],
+    [("genres", 1), ("year", -1)],
+    [("type", 1), ("imdb.rating", -1)],
+    [("type", 1), ("year", -1)],
+    [("rated", 1), ("imdb.rating", -1)],
+]
+
+# How often the planner re-reads which whitelisted indexes actually exist.
+MOVIE_INDEX_REFRESH_SECONDS = 300
+
+MAX_GENRE_FILTERS = 5
+# Larger integers would overflow BSON encoding on a real server.
+MAX_QUERY_INT = 2 ** 31 - 1
+MAX_SORTED_SKIP = 10000
+
+MOVIE_CARD_PROJECTION = {"title": 1, "poster": 1, "year": 1, "runtime": 1, "imdb": 1, "genres": 1}
+
+SIMILARITY_INDEX_DIR = os.getenv(
+    "SIMILARITY_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "similarity")
+)
+SIMILARITY_TOP_K = 20
+SIMILARITY_DEFAULT_LIMIT = 10
+SIMILARITY_FEATURE_WEIGHTS = {"genre": 1.0, "director": 1.5, "cast": 0.75, "decade": 0.5}
+SIMILARITY_MAX_CAST = 5
+SIMILARITY_BLOCK_ROWS = 512
+
+EMBEDDING_INDEX_DIR = os.getenv(
+    "EMBEDDING_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "embeddings")
+)
+EMBEDDING_SEARCH_DEFAULT_LIMIT = 10
+EMBEDDING_SEARCH_MAX_LIMIT = 50
+EMBEDDING_SCAN_BATCH_ROWS = 8192
+# sample_mflix's plot_embedding vectors were produced with this model, so text
+# queries must be embedded with it too.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_API_URL = os.getenv("EMBEDDING_API_URL", "https://api.openai.com/v1/embeddings")
+EMBEDDING_API_KEY = os.getenv("OPENAI_API_KEY")
+EMBEDDING_API_TIMEOUT_SECONDS = 5
+
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_REFRESH_SECONDS = 300
+SUGGEST_REFRESH_BUDGET_MS = 30000
+# Refreshes in between only add newly inserted movies; a full rebuild picks up
+# renames, vote changes and deletions.
+SUGGEST_FULL_REBUILD_SECONDS = 1800
+# After a failed refresh, wait this long before trying again.
+SUGGEST_RETRY_SECONDS = 2
+# Results for prefixes this short cover thousands of titles, so they are ranked once per refresh.
+SUGGEST_PRECOMPUTED_PREFIX_LENGTH = 2
+SUGGEST_LEADING_ARTICLES = ("the ", "a ", "an ")
+
+EXPORT_BATCH_SIZE = 5000
+EXPORT_CHUNK_DOCS = 500
+EXPORT_CHECKPOINT_EVERY = 5000
+# Exports stream for minutes, so they get their own small concurrency limit
+# instead of holding slots of the global in-flight cap.
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "4"))
+EXPORT_MAX_SHARDS = 8
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Field lists double as projections and CSV column order; None exports whole
+# documents (NDJSON only) minus EXPORT_EXCLUDED_FIELDS.
+EXPORT_PROFILES = {
+    "movies": {
+        "default": ["title", "year", "released", "runtime", "rated", "type", "genres", "directors", "cast",
+                    "imdb.id", "imdb.rating", "imdb.votes"],
+        "card": ["title", "poster", "year", "runtime", "genres", "imdb.rating"],
+        "full": None,
+    },
+    "comments": {
+        "default": ["movie_id", "name", "text", "date"],
+        "full": None,
+    },
+}
+# Never exported, whatever the profile: commenter emails are personal data.
+EXPORT_EXCLUDED_FIELDS = {"comments": ["email"]}
+
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
 app.config['SECRET_KEY'] = os.getenv("FLASK_SECRET_KEY")
 if not app.config['SECRET_KEY']:
      
@@ -50,10 +200,11 @@ if not MONGODB_URI:
 else:
     try:
         
-        client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)   
+        client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000, maxPoolSize=MONGO_MAX_POOL_SIZE)   
         sample_mflix_db = client.get_database("sample_mflix")
         movies_collection = sample_mflix_db["movies"]     
         comments_collection = sample_mflix_db["comments"] 
+        embedded_movies_collection = sample_mflix_db["embedded_movies"]
    
         try:
              users_db = client.get_database("movies_db") 
@@ -74,6 +225,7 @@ else:
         
         movies_collection = None
         comments_collection = None
+        embedded_movies_collection = None
         users_collection = None
          
     except Exception as e:
@@ -85,12 +237,14 @@ else:
          
         movies_collection = None
         comments_collection = None
+        embedded_movies_collection = None
         users_collection = None
         theaters_collection = None
         sessions_collection = None
 
 if 'movies_collection' not in locals(): movies_collection = None
 if 'comments_collection' not in locals(): comments_collection = None
+if 'embedded_movies_collection' not in locals(): embedded_movies_collection = None
 if 'users_collection' not in locals(): users_collection = None
 
 if app.config['SECRET_KEY'] and users_collection is not None:
@@ -148,10 +302,15 @@ def load_user(user_id):
              return None 
 
         
-        user_doc = users_collection.find_one({"_id": ObjectId(user_id)})
+        user_doc = mongo_breaker.call(
+            lambda: users_collection.find_one({"_id": ObjectId(user_id)}, max_time_ms=QUERY_TIME_BUDGET_MS["user_loader"])
+        )
         if user_doc:
             
             return User(user_doc)
+    except (CircuitOpenError,) + BREAKER_FAILURE_ERRORS:
+        # A database outage is a 503, not a logged-out user.
+        raise
     except Exception as e:
         
         log_func = app.logger.error if app.has_request_context() else print
@@ -175,6 +334,509 @@ def serialize_doc(doc):
         
         return doc
 
+
+class _InFlightCall:
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent callers asking for the same key share one execution and its result.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {}
+
+    @staticmethod
+    def make_key(route, **params):
+        return route + ":" + json.dumps(params, sort_keys=True, default=str)
+
+    def do(self, route, params, fn):
+        key = self.make_key(route, **params)
+        with self._lock:
+            route_stats = self._stats.setdefault(route, {"executed": 0, "coalesced": 0, "errors": 0})
+            call = self._calls.get(key)
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                route_stats["executed"] += 1
+                is_leader = True
+            else:
+                route_stats["coalesced"] += 1
+                is_leader = False
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                route_stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "routes": {route: dict(values) for route, values in self._stats.items()},
+                "coalesced_total": sum(values["coalesced"] for values in self._stats.values()),
+                "executed_total": sum(values["executed"] for values in self._stats.values()),
+            }
+
+
+catalog_flight = SingleFlight()
+
+
+class CircuitOpenError(Exception):
+
+    def __init__(self, retry_after):
+        super().__init__("MongoDB circuit breaker is open")
+        self.retry_after = retry_after
+
+
+# Only errors that say the cluster is unhealthy count against the breaker;
+# a bad regex or a duplicate key is the caller's problem, not MongoDB's. A slow
+# regex still times out, so title searches run behind their own breaker.
+BREAKER_FAILURE_ERRORS = (ConnectionFailure, ExecutionTimeout)
+
+
+class CircuitBreaker:
+
+    def __init__(self, window_seconds, min_requests, error_rate, cooldown_seconds):
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._outcomes = deque()
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+        self._trips = 0
+
+    def _prune(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == "closed":
+                return False
+            now = time.monotonic()
+            remaining = self.cooldown_seconds - (now - self._opened_at)
+            if self._state == "open" and remaining <= 0:
+                self._state = "half_open"
+            if self._state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            raise CircuitOpenError(max(1, ceil(remaining)))
+
+    def _after_call(self, is_probe, failed):
+        with self._lock:
+            now = time.monotonic()
+            if is_probe:
+                self._probe_in_flight = False
+                if failed:
+                    self._state = "open"
+                    self._opened_at = now
+                else:
+                    self._state = "closed"
+                    self._outcomes.clear()
+                return
+
+            self._outcomes.append((now, failed))
+            self._prune(now)
+            if self._state != "closed" or len(self._outcomes) < self.min_requests:
+                return
+            failures = sum(1 for _, was_failure in self._outcomes if was_failure)
+            if failures / len(self._outcomes) >= self.error_rate:
+                self._state = "open"
+                self._opened_at = now
+                self._trips += 1
+
+    def call(self, fn):
+        is_probe = self._before_call()
+        try:
+            result = fn()
+        except BREAKER_FAILURE_ERRORS:
+            self._after_call(is_probe, True)
+            raise
+        except Exception:
+            self._after_call(is_probe, False)
+            raise
+        self._after_call(is_probe, False)
+        return result
+
+    def stats(self):
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                "state": self._state,
+                "window_requests": len(self._outcomes),
+                "window_failures": sum(1 for _, was_failure in self._outcomes if was_failure),
+                "rejected": self._rejected,
+                "trips": self._trips,
+            }
+
+
+class StaleCache:
+    # Last good response per query key, served only when MongoDB is unavailable.
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._served = 0
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None, False
+            self._served += 1
+            return self._entries[key], True
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "served": self._served}
+
+
+mongo_breaker = CircuitBreaker(
+    BREAKER_WINDOW_SECONDS,
+    BREAKER_MIN_REQUESTS,
+    BREAKER_ERROR_RATE,
+    BREAKER_COOLDOWN_SECONDS
+)
+# Client-chosen regexes can time out on a healthy cluster; tripping this one
+# only fails searches instead of every route.
+search_breaker = CircuitBreaker(
+    BREAKER_WINDOW_SECONDS,
+    BREAKER_MIN_REQUESTS,
+    BREAKER_ERROR_RATE,
+    BREAKER_COOLDOWN_SECONDS
+)
+stale_cache = StaleCache(STALE_CACHE_MAX_ENTRIES)
+
+
+def run_read_query(route, params, fn, breaker=None):
+    breaker = breaker or mongo_breaker
+    key = SingleFlight.make_key(route, **params)
+    try:
+        result = catalog_flight.do(route, params, lambda: breaker.call(fn))
+    except (CircuitOpenError,) + BREAKER_FAILURE_ERRORS as e:
+        cached, found = stale_cache.get(key)
+        if not found:
+            raise
+        current_app.logger.warning(f"Serving stale response for {route} after MongoDB error: {e}")
+        return cached, True
+    stale_cache.put(key, result)
+    return result, False
+
+
+def read_response(payload, is_stale):
+    if not is_stale:
+        return jsonify(payload), 200
+    response = jsonify({**payload, "stale": True})
+    response.headers["Warning"] = '110 - "Response is Stale"'
+    return response, 200
+
+
+def unavailable_response(e):
+    response = jsonify({"error": "Database temporarily unavailable, please retry later"})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 503
+
+
+@app.errorhandler(CircuitOpenError)
+def circuit_open_handler(e):
+    return unavailable_response(e)
+
+
+# Raised outside a route's own try, e.g. while Flask-Login loads the session user.
+@app.errorhandler(ConnectionFailure)
+@app.errorhandler(ExecutionTimeout)
+def database_unavailable_handler(e):
+    app.logger.error(f"MongoDB unavailable while handling {request.path}: {e}")
+    return jsonify({"error": "Database temporarily unavailable, please retry later"}), 503
+
+
+def timeout_response(route):
+    current_app.logger.error(f"MongoDB query exceeded {QUERY_TIME_BUDGET_MS[route]}ms budget for {route}")
+    return jsonify({"error": "Database query timed out"}), 503
+
+
+class MemoryRateLimitBackend:
+    # Per-process token buckets: every worker enforces the full budget, so the
+    # effective limit is workers x budget. Use the mongo backend to share it.
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # Least recently used first, so the cap is enforced by popping from the front.
+        self._buckets = OrderedDict()
+
+    def take(self, key, capacity, refill_per_second):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(capacity)
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_per_second)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class MongoRateLimitBackend:
+    # Buckets shared by every worker, refilled atomically server-side with $$NOW.
+
+    def __init__(self, collection, breaker):
+        self.collection = collection
+        self.breaker = breaker
+
+    def ensure_ttl_index(self):
+        # Idle buckets are full again long before this, so expiring them loses nothing.
+        self.collection.create_index("updated_at", expireAfterSeconds=RATE_LIMIT_BUCKET_TTL_SECONDS)
+
+    def take(self, key, capacity, refill_per_second):
+        return self.breaker.call(lambda: self._take(key, capacity, refill_per_second))
+
+    def _take(self, key, capacity, refill_per_second):
+        refilled = {"$min": [capacity, {"$add": [
+            {"$ifNull": ["$tokens", capacity]},
+            {"$multiply": [
+                {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]},
+                refill_per_second
+            ]}
+        ]}]}
+        doc = self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]}
+                }}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            maxTimeMS=RATE_LIMIT_BACKEND_TIMEOUT_MS
+        )
+        return doc["allowed"], doc["tokens"]
+
+
+class RateLimiter:
+
+    def __init__(self, backend, limits, fallback=None):
+        self.backend = backend
+        self.fallback = fallback
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._rejected = {group: 0 for group in limits}
+        self._fallbacks = 0
+
+    def check(self, group, client_key):
+        capacity, refill_per_second = self.limits[group]
+        bucket_key = f"{group}:{client_key}"
+        try:
+            allowed, tokens = self.backend.take(bucket_key, capacity, refill_per_second)
+        except Exception as e:
+            # A broken shared backend must not take the API down with it; keep
+            # limiting per process until it recovers.
+            if self.fallback is None:
+                current_app.logger.error(f"Rate limit backend failed for {group}, allowing request: {e}")
+                return True, 0
+            if not isinstance(e, CircuitOpenError):
+                current_app.logger.error(f"Rate limit backend failed for {group}, using in-process buckets: {e}")
+            with self._lock:
+                self._fallbacks += 1
+            allowed, tokens = self.fallback.take(bucket_key, capacity, refill_per_second)
+        if allowed:
+            return True, 0
+        with self._lock:
+            self._rejected[group] += 1
+        return False, max(1, ceil((1 - tokens) / refill_per_second))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "rejected": dict(self._rejected),
+                "fallbacks": self._fallbacks,
+            }
+
+
+class AdmissionController:
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._shed = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self._shed += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self._in_flight, "max_in_flight": self.max_in_flight, "shed": self._shed}
+
+
+if RATE_LIMIT_BACKEND == "mongo" and users_db is not None:
+    # Its own breaker: the tight budget should not trip fail-fast for catalog reads.
+    rate_limit_breaker = CircuitBreaker(
+        BREAKER_WINDOW_SECONDS,
+        BREAKER_MIN_REQUESTS,
+        BREAKER_ERROR_RATE,
+        BREAKER_COOLDOWN_SECONDS
+    )
+    mongo_rate_limit_backend = MongoRateLimitBackend(users_db["rate_limits"], rate_limit_breaker)
+    try:
+        mongo_rate_limit_backend.ensure_ttl_index()
+    except Exception as e:
+        print(f"Warning: could not create TTL index on movies_db.rate_limits: {e}")
+    rate_limiter = RateLimiter(mongo_rate_limit_backend, RATE_LIMITS, fallback=MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS))
+else:
+    if RATE_LIMIT_BACKEND != "memory":
+        print(f"Warning: rate limit backend '{RATE_LIMIT_BACKEND}' unavailable, falling back to in-process buckets.")
+    rate_limiter = RateLimiter(MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS), RATE_LIMITS)
+
+admission = AdmissionController(MAX_IN_FLIGHT_REQUESTS)
+export_admission = AdmissionController(EXPORT_MAX_CONCURRENT)
+
+ADMISSION_EXEMPT_PATHS = {"/api/metrics"}
+
+
+def is_export_stream_path(path):
+    return path.startswith("/api/export/") and not path.endswith("/shards")
+
+
+def rate_limit_group():
+    if request.path in ("/api/login", "/api/register"):
+        return "auth"
+    if request.method in ("POST", "PUT", "PATCH", "DELETE"):
+        return "write"
+    if request.path == "/api/movies" and request.args.get('search', '').strip():
+        return "search"
+    if request.path == "/api/movies/semantic":
+        return "search"
+    return None
+
+
+def client_ip():
+    # With TRUSTED_PROXY_HOPS set, ProxyFix has already replaced remote_addr with
+    # the address the outermost trusted proxy saw.
+    return request.remote_addr or "unknown"
+
+
+def rate_limit_key(group):
+    if group == "write":
+        user_id = session.get("_user_id")
+        if user_id:
+            return f"user:{user_id}"
+    return f"ip:{client_ip()}"
+
+
+def server_busy_response():
+    response = jsonify({"error": "Server is busy, please retry later"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def too_many_requests_response(retry_after):
+    response = jsonify({"error": "Too many requests, please slow down"})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+
+@app.before_request
+def admit_request():
+    if request.path in ADMISSION_EXEMPT_PATHS:
+        return None
+
+    if is_export_stream_path(request.path):
+        if not export_admission.try_acquire():
+            app.logger.warning(f"Shedding export {request.path}: {export_admission.max_in_flight} exports already running")
+            return server_busy_response()
+        g.export_admitted = True
+        return None
+
+    # Admission first: with a shared backend the rate limit check itself talks
+    # to MongoDB and must count against the in-flight cap.
+    if not admission.try_acquire():
+        app.logger.warning(f"Shedding {request.method} {request.path}: {admission.max_in_flight} requests already in flight")
+        return server_busy_response()
+    g.admitted = True
+
+    group = rate_limit_group()
+    if group is not None:
+        allowed, retry_after = rate_limiter.check(group, rate_limit_key(group))
+        if not allowed:
+            app.logger.warning(f"Rate limit exceeded for {group} by {rate_limit_key(group)} on {request.path}")
+            return too_many_requests_response(retry_after)
+    return None
+
+
+@app.teardown_request
+def release_admission(exc):
+    if g.pop("admitted", False):
+        admission.release()
+    if g.pop("export_admitted", False):
+        export_admission.release()
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics_route():
+    return jsonify({
+        "singleflight": catalog_flight.stats(),
+        "circuit_breaker": mongo_breaker.stats(),
+        "search_circuit_breaker": search_breaker.stats(),
+        "stale_cache": stale_cache.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "admission": admission.stats(),
+        "export_admission": export_admission.stats(),
+        "title_suggest": title_suggest_index.stats()
+    }), 200
+
+
 @app.route('/api/register', methods=['POST'])
 def register_user_route(): 
     
@@ -202,9 +864,13 @@ def register_user_route():
 
     
     try:
-        if users_collection.find_one({"email": email}):
+        if mongo_breaker.call(lambda: users_collection.find_one({"email": email}, max_time_ms=QUERY_TIME_BUDGET_MS["auth"])):
             logger.warning(f"Registration attempt with existing email: {email}")
             return jsonify({"error": "User with this email already exists"}), 409 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("auth")
     except OperationFailure as e:
         logger.error(f"MongoDB Operation Failed checking existing user during registration: {e}")
         return jsonify({"error": "Database error during registration check"}), 500
@@ -231,7 +897,7 @@ def register_user_route():
         }
 
         
-        result = users_collection.insert_one(user_data)
+        result = mongo_breaker.call(lambda: users_collection.insert_one(user_data))
 
         
         
@@ -252,6 +918,8 @@ def register_user_route():
              }
          }), 201 
 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
     except OperationFailure as e:
         logger.error(f"MongoDB Operation Failed during user registration insert: {e}")
         return jsonify({"error": "Database error during registration"}), 500
@@ -286,7 +954,9 @@ def login_route():
 
     try:
         
-        user_doc = users_collection.find_one({"email": email})
+        user_doc = mongo_breaker.call(
+            lambda: users_collection.find_one({"email": email}, max_time_ms=QUERY_TIME_BUDGET_MS["auth"])
+        )
 
         if not user_doc:
             
@@ -342,6 +1012,10 @@ def login_route():
             }
         }), 200 
 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("auth")
     except OperationFailure as e:
         logger.error(f"MongoDB Operation Failed during login query for email {email}: {e}")
         return jsonify({"error": "Database error during login"}), 500
@@ -389,6 +1063,782 @@ def get_current_user_route():
 
 
 
+class MovieQueryError(ValueError):
+    pass
+
+
+def parse_int_param(name):
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise MovieQueryError(f"'{name}' must be an integer")
+    if abs(number) > MAX_QUERY_INT:
+        raise MovieQueryError(f"'{name}' is out of range")
+    return number
+
+
+def parse_float_param(name):
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise MovieQueryError(f"'{name}' must be a number")
+    if not isfinite(number):
+        raise MovieQueryError(f"'{name}' must be a finite number")
+    return number
+
+
+def build_movies_filter(args):
+    query = {}
+    equality_fields = set()
+
+    search_term = args.get('search', '').strip()
+    if search_term:
+        query['title'] = {"$regex": search_term, "$options": "i"}
+
+    genres = [genre.strip() for genre in args.get('genres', '').split(',') if genre.strip()]
+    category = args.get('category', '').strip()
+    if category and category not in genres:
+        genres.append(category)
+    if len(genres) > MAX_GENRE_FILTERS:
+        raise MovieQueryError(f"At most {MAX_GENRE_FILTERS} genres can be filtered at once")
+    genres_match = args.get('genres_match', 'any').strip().lower()
+    if genres_match not in ("any", "all"):
+        raise MovieQueryError("'genres_match' must be 'any' or 'all'")
+    if len(genres) == 1:
+        query['genres'] = genres[0]
+    elif genres:
+        query['genres'] = {"$in" if genres_match == "any" else "$all": genres}
+    if genres:
+        equality_fields.add("genres")
+
+    for field in ("type", "rated"):
+        value = args.get(field, '').strip()
+        if value:
+            query[field] = value
+            equality_fields.add(field)
+
+    year_min = parse_int_param('year_min')
+    year_max = parse_int_param('year_max')
+    if year_min is not None and year_max is not None and year_min > year_max:
+        raise MovieQueryError("'year_min' cannot be greater than 'year_max'")
+    year_range = {}
+    if year_min is not None:
+        year_range["$gte"] = year_min
+    if year_max is not None:
+        year_range["$lte"] = year_max
+    if year_range:
+        query['year'] = year_range
+
+    rating_min = parse_float_param('rating_min')
+    if rating_min is not None:
+        query['imdb.rating'] = {"$gte": rating_min}
+
+    return query, equality_fields
+
+
+class MovieIndexCatalog:
+    # Whitelisted indexes that exist on the collection. Hinting an index that was
+    # never built fails every sorted query, so the planner only sees these.
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._available = []
+        self._refreshed_at = None
+
+    def refresh(self, collection):
+        existing = set()
+        for info in collection.index_information().values():
+            existing.add(tuple((field, int(direction)) for field, direction in info["key"]))
+        available = [index for index in MOVIE_QUERY_INDEXES if tuple(index) in existing]
+        with self._lock:
+            self._available = available
+            self._refreshed_at = time.monotonic()
+        return available
+
+    def available(self, collection):
+        with self._lock:
+            available = self._available
+            refreshed_at = self._refreshed_at
+        if refreshed_at is not None and time.monotonic() - refreshed_at < self.refresh_seconds:
+            return available
+        try:
+            return mongo_breaker.call(lambda: self.refresh(collection))
+        except Exception as e:
+            log_func = app.logger.warning if app.has_request_context() else print
+            log_func(f"Could not read movies indexes, planning with last known set: {e}")
+            return available
+
+
+movie_index_catalog = MovieIndexCatalog(MOVIE_INDEX_REFRESH_SECONDS)
+if movies_collection is not None:
+    try:
+        movie_index_catalog.refresh(movies_collection)
+    except Exception as e:
+        print(f"Warning: could not read indexes on movies, sorted queries will be refused until they can be: {e}")
+
+
+def plan_movies_query(equality_fields, sort_field, indexes):
+    # Pick an existing whitelisted index that yields documents already in sort
+    # order: every key ahead of the sort key must be pinned by an equality (or
+    # small $in/$all) filter. Remaining filters are applied to the fetched
+    # documents. Shapes with no such index would need a blocking in-memory sort
+    # and are refused.
+    best_index = None
+    best_prefix_len = -1
+    for index in indexes:
+        keys = [key for key, _ in index]
+        if sort_field not in keys:
+            continue
+        prefix = keys[:keys.index(sort_field)]
+        if not set(prefix) <= equality_fields:
+            continue
+        if len(prefix) > best_prefix_len:
+            best_index = index
+            best_prefix_len = len(prefix)
+    return best_index
+
+
+class SimilarityIndex:
+    # Precomputed top-K neighbours per movie. Rows are ordered by hex _id so a
+    # lookup is one binary search over the memory-mapped id array.
+
+    FILES = ("ids.npy", "neighbors.npy", "scores.npy")
+
+    def __init__(self, ids, neighbors, scores):
+        self.ids = ids
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @classmethod
+    def load(cls, directory):
+        paths = [os.path.join(directory, name) for name in cls.FILES]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        return cls(*(np.load(path, mmap_mode="r") for path in paths))
+
+    def lookup(self, movie_id, limit):
+        key = movie_id.encode("ascii")
+        row = int(np.searchsorted(self.ids, key))
+        if row >= len(self.ids) or self.ids[row] != key:
+            return None
+        neighbor_rows = self.neighbors[row, :limit]
+        neighbor_scores = self.scores[row, :limit]
+        return [
+            (self.ids[neighbor].decode("ascii"), float(score))
+            for neighbor, score in zip(neighbor_rows, neighbor_scores)
+            if neighbor >= 0
+        ]
+
+
+def parse_movie_year(value):
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def build_similarity_index(movie_docs, top_k, directory):
+    # Cosine similarity over weighted genre, decade, director and cast features.
+    # Genres and decades are few, so they form a small dense block multiplied in
+    # row batches; people are sparse and added through an inverted index.
+    docs = sorted(movie_docs, key=lambda doc: str(doc["_id"]))
+    total = len(docs)
+    if total < 2:
+        raise ValueError("Need at least two movies to build a similarity index")
+    top_k = min(top_k, total - 1)
+    weights = SIMILARITY_FEATURE_WEIGHTS
+
+    genre_vocab = {}
+    decade_vocab = {}
+    for doc in docs:
+        for genre in doc.get("genres") or []:
+            genre_vocab.setdefault(genre, len(genre_vocab))
+        year = parse_movie_year(doc.get("year"))
+        if year is not None:
+            decade_vocab.setdefault(year // 10, None)
+    for position, decade in enumerate(sorted(decade_vocab)):
+        decade_vocab[decade] = len(genre_vocab) + position
+
+    dense = np.zeros((total, len(genre_vocab) + len(decade_vocab)), dtype=np.float32)
+    postings = {}
+    people_weight_sq = np.zeros(total, dtype=np.float32)
+    for row, doc in enumerate(docs):
+        for genre in doc.get("genres") or []:
+            dense[row, genre_vocab[genre]] = weights["genre"]
+        year = parse_movie_year(doc.get("year"))
+        if year is not None:
+            decade = year // 10
+            dense[row, decade_vocab[decade]] = weights["decade"]
+            for neighbor_decade in (decade - 1, decade + 1):
+                if neighbor_decade in decade_vocab:
+                    dense[row, decade_vocab[neighbor_decade]] = weights["decade"] / 2
+
+        people = {("director", name) for name in doc.get("directors") or []}
+        people |= {("cast", name) for name in (doc.get("cast") or [])[:SIMILARITY_MAX_CAST]}
+        for feature in people:
+            postings.setdefault(feature, []).append(row)
+            people_weight_sq[row] += weights[feature[0]] ** 2
+
+    shared_postings = {feature: np.array(rows, dtype=np.int32) for feature, rows in postings.items() if len(rows) > 1}
+    row_features = [[] for _ in range(total)]
+    for feature, rows in shared_postings.items():
+        for row in rows:
+            row_features[row].append(feature)
+
+    norms = np.sqrt((dense * dense).sum(axis=1) + people_weight_sq)
+    norms[norms == 0] = 1.0
+
+    neighbors = np.full((total, top_k), -1, dtype=np.int32)
+    scores = np.zeros((total, top_k), dtype=np.float32)
+    for start in range(0, total, SIMILARITY_BLOCK_ROWS):
+        end = min(start + SIMILARITY_BLOCK_ROWS, total)
+        block = dense[start:end] @ dense.T
+        for offset, row in enumerate(range(start, end)):
+            for feature in row_features[row]:
+                block[offset, shared_postings[feature]] += weights[feature[0]] ** 2
+        block /= norms[start:end, None] * norms[None, :]
+        block[np.arange(end - start), np.arange(start, end)] = -1.0
+
+        top = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        neighbors[start:end] = np.where(top_scores > 0, top, -1)
+        scores[start:end] = np.where(top_scores > 0, top_scores, 0.0)
+
+    ids = np.array([str(doc["_id"]).encode("ascii") for doc in docs], dtype="S24")
+    os.makedirs(directory, exist_ok=True)
+    for name, array in zip(SimilarityIndex.FILES, (ids, neighbors, scores)):
+        tmp_path = os.path.join(directory, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(directory, name))
+    return total
+
+
+try:
+    similarity_index = SimilarityIndex.load(SIMILARITY_INDEX_DIR)
+except Exception as e:
+    print(f"Warning: could not load similarity index from {SIMILARITY_INDEX_DIR}: {e}")
+    similarity_index = None
+
+
+class EmbeddingUnavailableError(Exception):
+    pass
+
+
+class EmbeddingIndex:
+    # Unit-normalised plot embeddings, either float32 or int8 with a per-row
+    # scale, memory-mapped from a snapshot and scanned in row batches.
+
+    def __init__(self, ids, vectors, scales, genre_masks, years, genre_vocab):
+        self.ids = ids
+        self.vectors = vectors
+        self.scales = scales
+        self.genre_masks = genre_masks
+        self.years = years
+        self.genre_bits = {genre: 1 << position for position, genre in enumerate(genre_vocab)}
+
+    @classmethod
+    def load(cls, directory):
+        if not os.path.exists(os.path.join(directory, "ids.npy")):
+            return None
+
+        def load_array(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        if os.path.exists(os.path.join(directory, "vectors_int8.npy")):
+            vectors = load_array("vectors_int8.npy")
+            scales = load_array("scales.npy")
+        else:
+            vectors = load_array("vectors.npy")
+            scales = None
+        with open(os.path.join(directory, "genres.json")) as f:
+            genre_vocab = json.load(f)
+        return cls(load_array("ids.npy"), vectors, scales, load_array("genre_masks.npy"), load_array("years.npy"), genre_vocab)
+
+    @property
+    def dimensions(self):
+        return self.vectors.shape[1]
+
+    def row_of(self, movie_id):
+        key = movie_id.encode("ascii")
+        row = int(np.searchsorted(self.ids, key))
+        if row >= len(self.ids) or self.ids[row] != key:
+            return None
+        return row
+
+    def vector(self, row):
+        vector = np.asarray(self.vectors[row], dtype=np.float32)
+        if self.scales is not None:
+            vector = vector * self.scales[row]
+        return vector
+
+    def candidate_rows(self, genres, year_min, year_max):
+        if not genres and year_min is None and year_max is None:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        if genres:
+            bits = 0
+            for genre in genres:
+                bits |= self.genre_bits.get(genre, 0)
+            mask &= (self.genre_masks & np.uint64(bits)) != 0
+        if year_min is not None:
+            mask &= self.years >= year_min
+        if year_max is not None:
+            mask &= self.years <= year_max
+        return np.flatnonzero(mask)
+
+    def search(self, query, limit, genres=None, year_min=None, year_max=None, exclude_row=None):
+        query = np.asarray(query, dtype=np.float32)
+        if query.shape != (self.dimensions,):
+            raise ValueError(f"Query vector has {query.size} dimensions, index has {self.dimensions}")
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        rows = self.candidate_rows(genres, year_min, year_max)
+        total = len(self.ids) if rows is None else len(rows)
+        keep = limit + 1
+        best_rows = []
+        best_scores = []
+        for start in range(0, total, EMBEDDING_SCAN_BATCH_ROWS):
+            end = min(start + EMBEDDING_SCAN_BATCH_ROWS, total)
+            batch_rows = np.arange(start, end) if rows is None else rows[start:end]
+            block = self.vectors[start:end] if rows is None else self.vectors[batch_rows]
+            if self.scales is None:
+                scores = block @ query
+            else:
+                scores = (block.astype(np.float32) @ query) * self.scales[batch_rows]
+            if len(scores) > keep:
+                top = np.argpartition(-scores, keep - 1)[:keep]
+                batch_rows = batch_rows[top]
+                scores = scores[top]
+            best_rows.append(batch_rows)
+            best_scores.append(scores)
+
+        if not best_rows:
+            return []
+        candidate_rows = np.concatenate(best_rows)
+        candidate_scores = np.concatenate(best_scores)
+        results = []
+        for position in np.argsort(-candidate_scores, kind="stable"):
+            row = int(candidate_rows[position])
+            if row == exclude_row:
+                continue
+            results.append((self.ids[row].decode("ascii"), float(candidate_scores[position])))
+            if len(results) == limit:
+                break
+        return results
+
+
+def build_embedding_snapshot(movie_docs, directory, quantize):
+    docs = []
+    dimensions = None
+    for doc in movie_docs:
+        embedding = doc.get("plot_embedding")
+        if not embedding:
+            continue
+        if dimensions is None:
+            dimensions = len(embedding)
+        if len(embedding) != dimensions:
+            continue
+        docs.append(doc)
+    if not docs:
+        raise ValueError("No movies with plot_embedding found")
+    docs.sort(key=lambda doc: str(doc["_id"]))
+
+    genre_vocab = sorted({genre for doc in docs for genre in doc.get("genres") or []})
+    if len(genre_vocab) > 64:
+        raise ValueError(f"Genre bitmask holds 64 genres, found {len(genre_vocab)}")
+    genre_bits = {genre: 1 << position for position, genre in enumerate(genre_vocab)}
+
+    vectors = np.array([doc["plot_embedding"] for doc in docs], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+
+    arrays = {
+        "ids.npy": np.array([str(doc["_id"]).encode("ascii") for doc in docs], dtype="S24"),
+        "genre_masks.npy": np.array(
+            [sum(genre_bits[genre] for genre in set(doc.get("genres") or [])) for doc in docs], dtype=np.uint64
+        ),
+        "years.npy": np.array([parse_movie_year(doc.get("year")) or 0 for doc in docs], dtype=np.int16),
+    }
+    if quantize:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        arrays["vectors_int8.npy"] = np.round(vectors / scales[:, None]).astype(np.int8)
+        arrays["scales.npy"] = scales.astype(np.float32)
+        stale_files = ["vectors.npy"]
+    else:
+        arrays["vectors.npy"] = vectors
+        stale_files = ["vectors_int8.npy", "scales.npy"]
+
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        tmp_path = os.path.join(directory, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(directory, name))
+    with open(os.path.join(directory, "genres.json"), "w") as f:
+        json.dump(genre_vocab, f)
+    for name in stale_files:
+        if os.path.exists(os.path.join(directory, name)):
+            os.remove(os.path.join(directory, name))
+    return len(docs), dimensions
+
+
+@lru_cache(maxsize=1024)
+def embed_query_text(text):
+    if not EMBEDDING_API_KEY:
+        raise EmbeddingUnavailableError("Text queries need OPENAI_API_KEY to be set; use like=<movie_id> instead")
+    response = requests.post(
+        EMBEDDING_API_URL,
+        headers={"Authorization": f"Bearer {EMBEDDING_API_KEY}"},
+        json={"model": EMBEDDING_MODEL, "input": text},
+        timeout=EMBEDDING_API_TIMEOUT_SECONDS
+    )
+    response.raise_for_status()
+    # float32 keeps a cached 1536-dim embedding at 6 KB; read-only because every
+    # caller shares the cached array.
+    vector = np.array(response.json()["data"][0]["embedding"], dtype=np.float32)
+    vector.flags.writeable = False
+    return vector
+
+
+try:
+    embedding_index = EmbeddingIndex.load(EMBEDDING_INDEX_DIR)
+except Exception as e:
+    print(f"Warning: could not load embedding snapshot from {EMBEDDING_INDEX_DIR}: {e}")
+    embedding_index = None
+
+
+def normalize_title(title):
+    text = unicodedata.normalize("NFKD", str(title))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return " ".join(re.sub(r"[\W_]+", " ", text).split())
+
+
+class TitleSuggestIndex:
+    # Sorted array of normalised titles; a prefix maps to a contiguous slice found
+    # with two binary searches. Refreshes build a new snapshot and swap it in, so
+    # readers never take a lock. Incremental refreshes are insert-only (_id >
+    # last seen _id): renamed, re-voted or deleted movies stay as they were until
+    # the next full rebuild, every SUGGEST_FULL_REBUILD_SECONDS.
+
+    def __init__(self):
+        self._snapshot = ([], [], {})
+        self._lock = threading.Lock()
+        # Held for a whole refresh so two callers can never merge the same movies twice.
+        self._refresh_lock = threading.Lock()
+        self._last_id = None
+        self._rebuilt_at = None
+        self._refreshed_at = None
+        self._failed_at = None
+        self._refreshing = False
+        self.ready = False
+
+    @staticmethod
+    def _top_entries(keys, entries, prefix, limit):
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + "\uffff", lo)
+        # A title is indexed with and without its leading article, so a slice can
+        # hold the same movie twice; over-fetch then de-duplicate.
+        ranked = heapq.nlargest(limit * 2, range(lo, hi), key=lambda position: entries[position][0])
+        results = []
+        seen_ids = set()
+        for position in ranked:
+            _, movie_id, title, year = entries[position]
+            if movie_id in seen_ids:
+                continue
+            seen_ids.add(movie_id)
+            results.append({"id": movie_id, "title": title, "year": year})
+            if len(results) == limit:
+                break
+        return results
+
+    def _merge(self, snapshot, last_id, movie_docs):
+        keys, entries, _ = snapshot
+        new_pairs = []
+        for doc in movie_docs:
+            if last_id is None or doc["_id"] > last_id:
+                last_id = doc["_id"]
+            title = doc.get("title")
+            if not isinstance(title, str):
+                continue
+            key = normalize_title(title)
+            if not key:
+                continue
+            votes = (doc.get("imdb") or {}).get("votes")
+            weight = votes if isinstance(votes, (int, float)) else 0
+            entry = (weight, str(doc["_id"]), title, parse_movie_year(doc.get("year")))
+            new_pairs.append((key, entry))
+            for article in SUGGEST_LEADING_ARTICLES:
+                if key.startswith(article) and len(key) > len(article):
+                    new_pairs.append((key[len(article):], entry))
+        if not new_pairs:
+            return snapshot, last_id
+        # The existing arrays are already sorted; only the new titles need sorting.
+        new_pairs.sort(key=lambda pair: pair[0])
+        pairs = list(heapq.merge(zip(keys, entries), new_pairs, key=lambda pair: pair[0]))
+
+        keys = [key for key, _ in pairs]
+        entries = [entry for _, entry in pairs]
+        short_prefixes = {key[:length] for key in keys for length in range(1, SUGGEST_PRECOMPUTED_PREFIX_LENGTH + 1)}
+        top_by_prefix = {
+            prefix: self._top_entries(keys, entries, prefix, SUGGEST_MAX_LIMIT)
+            for prefix in short_prefixes
+        }
+        return (keys, entries, top_by_prefix), last_id
+
+    def refresh(self, collection):
+        with self._refresh_lock:
+            started = time.monotonic()
+            full = self._last_id is None or self._rebuilt_at is None or started - self._rebuilt_at >= SUGGEST_FULL_REBUILD_SECONDS
+            if full:
+                base, last_id, query = ([], [], {}), None, {}
+            else:
+                # Only movies inserted since the last refresh are read; ObjectIds grow over time.
+                base, last_id, query = self._snapshot, self._last_id, {"_id": {"$gt": self._last_id}}
+            movie_docs = collection.find(
+                query, {"title": 1, "year": 1, "imdb.votes": 1}
+            ).sort("_id", 1).batch_size(5000).max_time_ms(SUGGEST_REFRESH_BUDGET_MS)
+            snapshot, last_id = self._merge(base, last_id, movie_docs)
+            self._snapshot = snapshot
+            self._last_id = last_id
+            if full:
+                self._rebuilt_at = started
+            self.ready = True
+            with self._lock:
+                self._refreshed_at = time.monotonic()
+                self._failed_at = None
+
+    def _refresh_in_background(self, collection):
+        try:
+            mongo_breaker.call(lambda: self.refresh(collection))
+        except Exception as e:
+            print(f"Warning: title suggestion index refresh failed: {e}")
+            with self._lock:
+                self._failed_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def maybe_refresh_async(self, collection):
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshing:
+                return
+            if self._failed_at is not None and now - self._failed_at < SUGGEST_RETRY_SECONDS:
+                return
+            if self._refreshed_at is not None and now - self._refreshed_at < SUGGEST_REFRESH_SECONDS:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, args=(collection,), daemon=True).start()
+
+    def suggest(self, prefix, limit):
+        key = normalize_title(prefix)
+        if not key:
+            return []
+        keys, entries, top_by_prefix = self._snapshot
+        if len(key) <= SUGGEST_PRECOMPUTED_PREFIX_LENGTH:
+            return top_by_prefix.get(key, [])[:limit]
+        return self._top_entries(keys, entries, key, limit)
+
+    def stats(self):
+        with self._lock:
+            refreshed_at = self._refreshed_at
+        rebuilt_at = self._rebuilt_at
+        now = time.monotonic()
+        return {
+            "ready": self.ready,
+            "entries": len(self._snapshot[0]),
+            "seconds_since_refresh": None if refreshed_at is None else round(now - refreshed_at, 1),
+            "seconds_since_rebuild": None if rebuilt_at is None else round(now - rebuilt_at, 1),
+        }
+
+
+# Built on the first /api/movies/suggest request, not at import, so CLI
+# commands and scripts that import the app don't scan the movies collection.
+title_suggest_index = TitleSuggestIndex()
+
+
+def export_collections():
+    return {"movies": movies_collection, "comments": comments_collection}
+
+
+def export_projection(collection_name, fields):
+    if fields is None:
+        return {field: 0 for field in EXPORT_EXCLUDED_FIELDS.get(collection_name, [])} or None
+    return {field: 1 for field in fields}
+
+
+def iter_export_docs(collection, projection, min_id=None, max_id=None, after_id=None):
+    # Always walk the _id index in order: shards are _id ranges and a resume
+    # point is just the last _id written.
+    id_range = {}
+    if min_id is not None:
+        id_range["$gte"] = min_id
+    if after_id is not None:
+        id_range["$gt"] = after_id
+    if max_id is not None:
+        id_range["$lt"] = max_id
+    query = {"_id": id_range} if id_range else {}
+    return collection.find(query, projection).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+
+
+def export_field_value(doc, field):
+    value = doc
+    for part in field.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    value = serialize_doc(value)
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "|".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def export_csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def format_export_row(doc, fmt, fields):
+    if fmt == "ndjson":
+        return json.dumps(serialize_doc(doc), ensure_ascii=False) + "\n"
+    return export_csv_line([str(doc["_id"])] + [export_field_value(doc, field) for field in fields])
+
+
+def export_csv_header(fields):
+    return export_csv_line(["_id"] + fields)
+
+
+def parse_export_id(name, value):
+    if not value:
+        return None
+    try:
+        return ObjectId(value)
+    except InvalidId:
+        raise MovieQueryError(f"'{name}' must be a valid ObjectId")
+
+
+@app.route('/api/export/<collection_name>', methods=['GET'])
+@login_required
+def export_collection_route(collection_name):
+    if collection_name not in EXPORT_PROFILES:
+        return jsonify({"error": f"Unknown export collection '{collection_name}'"}), 404
+    collection = export_collections()[collection_name]
+    if collection is None:
+        return jsonify({"error": f"Database connection failed or {collection_name} collection not available"}), 500
+
+    logger = current_app.logger
+    fmt = request.args.get('format', 'ndjson').strip().lower()
+    profile = request.args.get('profile', 'default').strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"'format' must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    if profile not in EXPORT_PROFILES[collection_name]:
+        return jsonify({"error": f"'profile' must be one of: {', '.join(EXPORT_PROFILES[collection_name])}"}), 400
+    fields = EXPORT_PROFILES[collection_name][profile]
+    if fmt == "csv" and fields is None:
+        return jsonify({"error": f"CSV export needs a fixed-column profile, not '{profile}'"}), 400
+    projection = export_projection(collection_name, fields)
+
+    try:
+        min_id = parse_export_id('min_id', request.args.get('min_id', '').strip())
+        max_id = parse_export_id('max_id', request.args.get('max_id', '').strip())
+        after_id = parse_export_id('after_id', request.args.get('after_id', '').strip())
+    except MovieQueryError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user_email = getattr(current_user, 'email', 'unknown')
+
+    def generate():
+        exported = 0
+        if fmt == "csv" and after_id is None:
+            yield export_csv_header(fields)
+        chunk = []
+        try:
+            for doc in iter_export_docs(collection, projection, min_id, max_id, after_id):
+                chunk.append(format_export_row(doc, fmt, fields))
+                if len(chunk) >= EXPORT_CHUNK_DOCS:
+                    exported += len(chunk)
+                    yield "".join(chunk)
+                    chunk = []
+            exported += len(chunk)
+            if chunk:
+                yield "".join(chunk)
+            logger.info(f"Export of {collection_name} ({fmt}, {profile}) for {user_email} finished. Exported {exported} documents.")
+        except Exception as e:
+            # Headers are already sent, so re-raise: the server drops the connection
+            # mid-body instead of ending the stream cleanly, and the client sees a
+            # truncated response. It resumes with after_id=<last _id received>.
+            logger.error(f"Export of {collection_name} for {user_email} aborted after {exported} documents: {e}", exc_info=True)
+            raise
+
+    logger.info(f"Export of {collection_name} ({fmt}, {profile}) started for {user_email}. Range: {min_id}..{max_id}, after: {after_id}")
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="{collection_name}.{fmt}"'
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route('/api/export/<collection_name>/shards', methods=['GET'])
+@login_required
+def get_export_shards_route(collection_name):
+    if collection_name not in EXPORT_PROFILES:
+        return jsonify({"error": f"Unknown export collection '{collection_name}'"}), 404
+    collection = export_collections()[collection_name]
+    if collection is None:
+        return jsonify({"error": f"Database connection failed or {collection_name} collection not available"}), 500
+
+    logger = current_app.logger
+    count = 4
+    try:
+        count = int(request.args.get('count', '4'))
+    except ValueError:
+        return jsonify({"error": "'count' must be an integer"}), 400
+    if count <= 0 or count > EXPORT_MAX_SHARDS:
+        return jsonify({"error": f"'count' must be between 1 and {EXPORT_MAX_SHARDS}"}), 400
+
+    try:
+        buckets = mongo_breaker.call(lambda: list(collection.aggregate(
+            [{"$bucketAuto": {"groupBy": "$_id", "buckets": count}}],
+            allowDiskUse=True
+        )))
+        # $bucketAuto bounds are [min, max) except the last bucket, whose max is inclusive.
+        shards = [
+            {
+                "min_id": str(bucket["_id"]["min"]),
+                "max_id": str(bucket["_id"]["max"]) if position < len(buckets) - 1 else None,
+                "count": bucket["count"],
+            }
+            for position, bucket in enumerate(buckets)
+        ]
+        logger.info(f"API /api/export/{collection_name}/shards executed. Returned {len(shards)} shards.")
+        return jsonify({"shards": shards}), 200
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except OperationFailure as e:
+        logger.error(f"MongoDB Operation Failed in get_export_shards_route for {collection_name}: {e}")
+        return jsonify({"error": "Database operation failed"}), 500
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in get_export_shards_route for {collection_name}: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/movies', methods=['GET'])
 def get_movies_route(): 
     
@@ -399,8 +1849,6 @@ def get_movies_route():
     logger = current_app.logger
     try:
         
-        search_term = request.args.get('search', '').strip()
-        category = request.args.get('category', '').strip()
         page_str = request.args.get('page', '1') 
         limit_str = request.args.get('limit', str(MOVIES_PER_PAGE_DEFAULT)) 
 
@@ -427,36 +1875,72 @@ def get_movies_route():
         if skip < 0: skip = 0 
 
 
-        query = {} 
-
-        if search_term:
-
-             query['title'] = {"$regex": search_term, "$options": "i"}
-
-        if category:
-
-            query['genres'] = category
-
-
-        total_count = movies_collection.count_documents(query)
-
-        movies_cursor = movies_collection.find(query).skip(skip).limit(limit)
+        try:
+            query, equality_fields = build_movies_filter(request.args)
+        except MovieQueryError as e:
+            logger.warning(f"Invalid /api/movies filter: {e}")
+            return jsonify({"error": str(e)}), 400
+
+        sort_key = request.args.get('sort', '').strip().lower()
+        order = request.args.get('order', '').strip().lower()
+        sort_spec = None
+        hint = None
+        if sort_key:
+            if sort_key not in MOVIE_SORT_FIELDS:
+                return jsonify({"error": f"'sort' must be one of: {', '.join(MOVIE_SORT_FIELDS)}"}), 400
+            if order and order not in ("asc", "desc"):
+                return jsonify({"error": "'order' must be 'asc' or 'desc'"}), 400
+            sort_field, direction = MOVIE_SORT_FIELDS[sort_key]
+            if order:
+                direction = 1 if order == "asc" else -1
+
+            hint = plan_movies_query(equality_fields, sort_field, movie_index_catalog.available(movies_collection))
+            if hint is None:
+                logger.warning(f"Rejected /api/movies sort '{sort_key}' with filters {sorted(equality_fields)}: no supporting index")
+                return jsonify({"error": f"Sorting by '{sort_key}' is not supported with the requested filters"}), 400
+            if skip > MAX_SORTED_SKIP:
+                return jsonify({"error": f"Sorted results are limited to the first {MAX_SORTED_SKIP} movies; narrow the filters instead"}), 400
+            sort_spec = [(sort_field, direction)]
+
+
+        def run_movies_query():
+            budget_ms = QUERY_TIME_BUDGET_MS["movies"]
+            total_count = movies_collection.count_documents(query, maxTimeMS=budget_ms)
+            movies_cursor = movies_collection.find(query)
+            if sort_spec:
+                movies_cursor = movies_cursor.sort(sort_spec).hint(hint)
+            movies_cursor = movies_cursor.skip(skip).limit(limit).max_time_ms(budget_ms)
+            return {
+                "movies": [serialize_doc(movie) for movie in movies_cursor],
+                "total_count": total_count
+            }
 
-        
-        
-        movies = [serialize_doc(movie) for movie in movies_cursor]
+        result, is_stale = run_read_query(
+            "movies",
+            {"filter": query, "sort": sort_spec, "skip": skip, "limit": limit, "projection": None},
+            run_movies_query,
+            breaker=search_breaker if "title" in query else None
+        )
+        movies = result["movies"]
+        total_count = result["total_count"]
 
         
-        logger.info(f"API /api/movies executed. Query: {query}, Page: {page}, Limit: {limit}, Skip: {skip}. Returned {len(movies)} movies (Total: {total_count} matching query).")
+        logger.info(f"API /api/movies executed. Query: {query}, Sort: {sort_spec}, Index: {hint}, Page: {page}, Limit: {limit}, Skip: {skip}. Returned {len(movies)} movies (Total: {total_count} matching query).")
 
         
-        return jsonify({
+        return read_response({
             "movies": movies,
             "total_count": total_count, 
             "page": page, 
-            "limit": limit 
-            }), 200 
-
+            "limit": limit,
+            "sort": sort_key or None,
+            "order": ("asc" if sort_spec[0][1] == 1 else "desc") if sort_spec else None
+            }, is_stale)
+
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("movies")
     except OperationFailure as e:
         
         logger.error(f"MongoDB Operation Failed in get_movies_route: {e}")
@@ -479,19 +1963,31 @@ def get_movie_by_id_route(movie_id):
         movie_obj_id = ObjectId(movie_id)
 
         
-        movie = movies_collection.find_one({"_id": movie_obj_id})
+        def run_movie_detail_query():
+            budget_ms = QUERY_TIME_BUDGET_MS["movie_detail"]
+            movie_doc = movies_collection.find_one({"_id": movie_obj_id}, max_time_ms=budget_ms)
+            if not movie_doc:
+                return None
+            comments_cursor = comments_collection.find({"movie_id": movie_obj_id}).sort("date", -1).max_time_ms(budget_ms)
+            return {
+                "movie": serialize_doc(movie_doc),
+                "comments": [serialize_doc(comment) for comment in comments_cursor]
+            }
 
-        if movie:
-            
-            movie = serialize_doc(movie)
-            
-            comments_cursor = comments_collection.find({"movie_id": movie_obj_id}).sort("date", -1)
+        result, is_stale = run_read_query(
+            "movie_detail",
+            {"filter": {"_id": movie_obj_id}, "sort": [["date", -1]], "skip": 0, "limit": 1, "projection": None},
+            run_movie_detail_query
+        )
+
+        if result:
             
-            comments = [serialize_doc(comment) for comment in comments_cursor]
+            movie = result["movie"]
+            comments = result["comments"]
 
             
             logger.info(f"API /api/movies/{movie_id} executed. Found movie and {len(comments)} comments.")
-            return jsonify({"movie": movie, "comments": comments}), 200 
+            return read_response({"movie": movie, "comments": comments}, is_stale)
         else:
             
             logger.warning(f"API /api/movies/{movie_id} executed. Movie not found.")
@@ -500,6 +1996,10 @@ def get_movie_by_id_route(movie_id):
         
         logger.warning(f"Invalid movie ID format received: {movie_id}")
         return jsonify({"error": "Invalid movie ID format"}), 400 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("movie_detail")
     except OperationFailure as e:
         
         logger.error(f"MongoDB Operation Failed in get_movie_by_id_route for ID {movie_id}: {e}")
@@ -512,6 +2012,189 @@ def get_movie_by_id_route(movie_id):
 
  
 
+@app.route('/api/movies/suggest', methods=['GET'])
+def get_title_suggestions_route():
+    if movies_collection is None:
+        return jsonify({"error": "Database connection failed or movies collection not available"}), 500
+
+    title_suggest_index.maybe_refresh_async(movies_collection)
+
+    prefix = request.args.get('prefix', '')
+    if not prefix.strip():
+        return jsonify({"error": "'prefix' is required"}), 400
+
+    limit = SUGGEST_DEFAULT_LIMIT
+    try:
+        limit = int(request.args.get('limit', str(SUGGEST_DEFAULT_LIMIT)))
+        if limit <= 0: limit = SUGGEST_DEFAULT_LIMIT
+        if limit > SUGGEST_MAX_LIMIT: limit = SUGGEST_MAX_LIMIT
+    except ValueError:
+        pass
+
+    if not title_suggest_index.ready:
+        response = jsonify({"error": "Title suggestions are warming up, please retry shortly"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+
+    suggestions = title_suggest_index.suggest(prefix, limit)
+    current_app.logger.debug(f"API /api/movies/suggest executed for prefix '{prefix}'. Returned {len(suggestions)} suggestions.")
+    return jsonify({"suggestions": suggestions}), 200
+
+
+
+@app.route('/api/movies/semantic', methods=['GET'])
+def get_semantic_movies_route():
+    if embedded_movies_collection is None:
+        return jsonify({"error": "Database connection failed or embedded_movies collection not available"}), 500
+    if embedding_index is None:
+        return jsonify({"error": "Embedding snapshot not built. Run `flask --app api/index build-embedding-snapshot`."}), 503
+
+    logger = current_app.logger
+    text_query = request.args.get('q', '').strip()
+    like_id = request.args.get('like', '').strip()
+    if bool(text_query) == bool(like_id):
+        return jsonify({"error": "Provide exactly one of 'q' or 'like'"}), 400
+
+    try:
+        limit = EMBEDDING_SEARCH_DEFAULT_LIMIT
+        try:
+            limit = int(request.args.get('limit', str(EMBEDDING_SEARCH_DEFAULT_LIMIT)))
+            if limit <= 0: limit = EMBEDDING_SEARCH_DEFAULT_LIMIT
+            if limit > EMBEDDING_SEARCH_MAX_LIMIT: limit = EMBEDDING_SEARCH_MAX_LIMIT
+        except ValueError:
+            logger.warning(f"Invalid limit parameter received for semantic search: '{request.args.get('limit')}'. Using default limit {limit}.")
+
+        genres = [genre.strip() for genre in request.args.get('genres', '').split(',') if genre.strip()]
+        try:
+            year_min = parse_int_param('year_min')
+            year_max = parse_int_param('year_max')
+        except MovieQueryError as e:
+            return jsonify({"error": str(e)}), 400
+
+        exclude_row = None
+        if like_id:
+            row = embedding_index.row_of(str(ObjectId(like_id)))
+            if row is None:
+                return jsonify({"error": "Movie has no plot embedding"}), 404
+            query_vector = embedding_index.vector(row)
+            exclude_row = row
+        else:
+            query_vector = embed_query_text(text_query)
+
+        matches = embedding_index.search(query_vector, limit, genres, year_min, year_max, exclude_row)
+        match_ids = [ObjectId(match_id) for match_id, _ in matches]
+
+        # Only the cards are shared through single-flight and the stale cache;
+        # scores belong to this query and are attached afterwards.
+        def run_semantic_query():
+            if not match_ids:
+                return {}
+            movies_cursor = embedded_movies_collection.find(
+                {"_id": {"$in": match_ids}}, MOVIE_CARD_PROJECTION
+            ).max_time_ms(QUERY_TIME_BUDGET_MS["semantic"])
+            return {str(movie["_id"]): serialize_doc(movie) for movie in movies_cursor}
+
+        cards_by_id, is_stale = run_read_query(
+            "semantic",
+            {"filter": {"_id": {"$in": match_ids}}, "sort": None, "skip": 0, "limit": limit, "projection": MOVIE_CARD_PROJECTION},
+            run_semantic_query
+        )
+        movies = [
+            {**cards_by_id[match_id], "score": round(score, 4)}
+            for match_id, score in matches
+            if match_id in cards_by_id
+        ]
+
+        logger.info(f"API /api/movies/semantic executed. Query: {'like=' + like_id if like_id else 'q'}, Genres: {genres}, Years: {year_min}-{year_max}. Returned {len(movies)} movies.")
+        return read_response({"movies": movies}, is_stale)
+
+    except InvalidId:
+        logger.warning(f"Invalid movie ID format received for semantic search: {like_id}")
+        return jsonify({"error": "Invalid movie ID format"}), 400
+    except EmbeddingUnavailableError as e:
+        return jsonify({"error": str(e)}), 503
+    except requests.RequestException as e:
+        logger.error(f"Embedding provider request failed in get_semantic_movies_route: {e}")
+        return jsonify({"error": "Embedding provider unavailable"}), 502
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("semantic")
+    except OperationFailure as e:
+        logger.error(f"MongoDB Operation Failed in get_semantic_movies_route: {e}")
+        return jsonify({"error": "Database operation failed"}), 500
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in get_semantic_movies_route: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+
+@app.route('/api/movies/<movie_id>/similar', methods=['GET'])
+def get_similar_movies_route(movie_id):
+    if movies_collection is None:
+        return jsonify({"error": "Database connection failed or movies collection not available"}), 500
+    if similarity_index is None:
+        return jsonify({"error": "Similarity index not built. Run `flask --app api/index build-similarity-index`."}), 503
+
+    logger = current_app.logger
+    try:
+        movie_obj_id = ObjectId(movie_id)
+
+        limit = SIMILARITY_DEFAULT_LIMIT
+        try:
+            limit = int(request.args.get('limit', str(SIMILARITY_DEFAULT_LIMIT)))
+            if limit <= 0: limit = SIMILARITY_DEFAULT_LIMIT
+            if limit > SIMILARITY_TOP_K: limit = SIMILARITY_TOP_K
+        except ValueError:
+            logger.warning(f"Invalid limit parameter received for similar movies: '{request.args.get('limit')}'. Using default limit {limit}.")
+
+        neighbors = similarity_index.lookup(str(movie_obj_id), limit)
+        if neighbors is None:
+            logger.warning(f"API /api/movies/{movie_id}/similar executed. Movie not in similarity index.")
+            return jsonify({"error": "Movie not found in similarity index"}), 404
+
+        neighbor_ids = [ObjectId(neighbor_id) for neighbor_id, _ in neighbors]
+
+        # Only the cards are shared through single-flight and the stale cache;
+        # scores belong to this source movie and are attached afterwards.
+        def run_similar_query():
+            if not neighbor_ids:
+                return {}
+            movies_cursor = movies_collection.find(
+                {"_id": {"$in": neighbor_ids}}, MOVIE_CARD_PROJECTION
+            ).max_time_ms(QUERY_TIME_BUDGET_MS["similar"])
+            return {str(movie["_id"]): serialize_doc(movie) for movie in movies_cursor}
+
+        cards_by_id, is_stale = run_read_query(
+            "similar",
+            {"filter": {"_id": {"$in": neighbor_ids}}, "sort": None, "skip": 0, "limit": limit, "projection": MOVIE_CARD_PROJECTION},
+            run_similar_query
+        )
+        similar_movies = [
+            {**cards_by_id[neighbor_id], "similarity": round(score, 4)}
+            for neighbor_id, score in neighbors
+            if neighbor_id in cards_by_id
+        ]
+
+        logger.info(f"API /api/movies/{movie_id}/similar executed. Returned {len(similar_movies)} similar movies.")
+        return read_response({"movies": similar_movies}, is_stale)
+
+    except InvalidId:
+        logger.warning(f"Invalid movie ID format received for similar movies: {movie_id}")
+        return jsonify({"error": "Invalid movie ID format"}), 400
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("similar")
+    except OperationFailure as e:
+        logger.error(f"MongoDB Operation Failed in get_similar_movies_route for ID {movie_id}: {e}")
+        return jsonify({"error": "Database operation failed"}), 500
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in get_similar_movies_route for ID {movie_id}: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
+
 @app.route('/api/movies/featured', methods=['GET'])
 def get_featured_movies_route():
     
@@ -526,17 +2209,31 @@ def get_featured_movies_route():
         
         
         featured_query = {"imdb.rating": {"$exists": True, "$ne": None, "$type": "number"}}
-        featured_movies_cursor = movies_collection.find(featured_query).sort("imdb.rating", -1).limit(10)
-
-        
-        featured_movies = [serialize_doc(movie) for movie in featured_movies_cursor]
+        def run_featured_query():
+            featured_movies_cursor = (
+                movies_collection.find(featured_query)
+                .sort("imdb.rating", -1)
+                .limit(10)
+                .max_time_ms(QUERY_TIME_BUDGET_MS["featured"])
+            )
+            return [serialize_doc(movie) for movie in featured_movies_cursor]
+
+        featured_movies, is_stale = run_read_query(
+            "featured",
+            {"filter": featured_query, "sort": [["imdb.rating", -1]], "skip": 0, "limit": 10, "projection": None},
+            run_featured_query
+        )
 
         logger.info(f"API /api/movies/featured executed. Query: {featured_query}. Found {len(featured_movies)} featured movies.")
 
         
         
-        return jsonify({"movies": featured_movies}), 200 
+        return read_response({"movies": featured_movies}, is_stale)
 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("featured")
     except OperationFailure as e:
         
         logger.error(f"MongoDB Operation Failed in get_featured_movies_route: {e}")
@@ -570,7 +2267,10 @@ def get_saved_movies_route():
 
 
         
-        user_doc = users_collection.find_one({"_id": user_obj_id}, {"saved_movie_ids": 1}) 
+        budget_ms = QUERY_TIME_BUDGET_MS["saved_movies"]
+        user_doc = mongo_breaker.call(
+            lambda: users_collection.find_one({"_id": user_obj_id}, {"saved_movie_ids": 1}, max_time_ms=budget_ms)
+        )
 
         if not user_doc:
              logger.error(f"User document not found for ID: {user_id_str} in get_saved_movies_route.")
@@ -600,15 +2300,19 @@ def get_saved_movies_route():
         saved_movies = []
         if valid_saved_movie_obj_ids:
             
-            saved_movies_cursor = movies_collection.find({"_id": {"$in": valid_saved_movie_obj_ids}})
-            
-            
-            saved_movies = [serialize_doc(movie) for movie in saved_movies_cursor]
+            saved_movies = mongo_breaker.call(lambda: [
+                serialize_doc(movie)
+                for movie in movies_collection.find({"_id": {"$in": valid_saved_movie_obj_ids}}).max_time_ms(budget_ms)
+            ])
             
 
         logger.info(f"API /api/users/me/movies executed for user {user_id_str}. Found {len(saved_movies)} saved movies.")
         return jsonify({"movies": saved_movies}), 200 
 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("saved_movies")
     except OperationFailure as e:
         logger.error(f"MongoDB Operation Failed in get_saved_movies_route for user {getattr(current_user, 'email', 'unknown')}: {e}")
         return jsonify({"error": "Database operation failed"}), 500
@@ -655,10 +2359,10 @@ def add_saved_movie_route():
             logger.warning(f"Invalid movie ID format received for adding: {movie_id_to_add_str} for user {user_id_str}")
             return jsonify({"error": "Invalid movie ID format"}), 400
  
-        result = users_collection.update_one(
+        result = mongo_breaker.call(lambda: users_collection.update_one(
             {"_id": user_obj_id},
             {"$addToSet": {"saved_movie_ids": movie_obj_id_to_add}}
-        )
+        ))
 
         if result.modified_count > 0:
             
@@ -669,6 +2373,8 @@ def add_saved_movie_route():
             logger.warning(f"Attempted to add movie {movie_id_to_add_str} for user {user_id_str}, but it was already in the saved list.")
             return jsonify({"message": "Movie already in saved list"}), 200 
 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
     except OperationFailure as e:
         logger.error(f"MongoDB Operation Failed in add_saved_movie_route for user {getattr(current_user, 'email', 'unknown')}: {e}")
         return jsonify({"error": "Database operation failed"}), 500
@@ -700,12 +2406,26 @@ def get_comments_by_movie_id_route():
 
         
         
-        comments_cursor = comments_collection.find({"movie_id": movie_obj_id}).sort("date", -1)
-        
-        comments = [serialize_doc(comment) for comment in comments_cursor]
+        def run_comments_query():
+            comments_cursor = (
+                comments_collection.find({"movie_id": movie_obj_id})
+                .sort("date", -1)
+                .max_time_ms(QUERY_TIME_BUDGET_MS["comments"])
+            )
+            return [serialize_doc(comment) for comment in comments_cursor]
+
+        comments, is_stale = run_read_query(
+            "comments",
+            {"filter": {"movie_id": movie_obj_id}, "sort": [["date", -1]], "skip": 0, "limit": 0, "projection": None},
+            run_comments_query
+        )
 
         logger.info(f"API /api/comments executed for movie {movie_id}. Found {len(comments)} comments.")
-        return jsonify({"comments": comments}), 200 
+        return read_response({"comments": comments}, is_stale)
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ExecutionTimeout:
+        return timeout_response("comments")
     except OperationFailure as e:
         logger.error(f"MongoDB Operation Failed in get_comments_by_movie_id_route for movie ID {movie_id}: {e}")
         return jsonify({"error": "Database operation failed"}), 500 
@@ -779,12 +2499,14 @@ def add_comment_route():
         }
 
         
-        inserted_comment = comments_collection.insert_one(comment)
+        inserted_comment = mongo_breaker.call(lambda: comments_collection.insert_one(comment))
 
         
         logger.info(f"Comment added by user {email} for movie {movie_id}. Comment ID: {inserted_comment.inserted_id}")
         return jsonify({"message": "Comment added successfully!", "comment_id": str(inserted_comment.inserted_id)}), 201 
 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
     except OperationFailure as e:
         
         logger.error(f"MongoDB Operation Failed in add_comment_route for user {getattr(current_user, 'email', 'unknown')}: {e}")
@@ -830,10 +2552,10 @@ def remove_saved_movie_route(movie_id):
              return jsonify({"error": "Internal server error processing user ID"}), 500
  
         logger.info(f"Executing MongoDB $pull operation for user {user_id_str}, removing movie_id {movie_obj_id_to_remove}") 
-        result = users_collection.update_one(
+        result = mongo_breaker.call(lambda: users_collection.update_one(
             {"_id": user_obj_id},
             {"$pull": {"saved_movie_ids": movie_obj_id_to_remove}}
-        )
+        ))
         logger.info(f"MongoDB update_one result: Matched Count = {result.matched_count}, Modified Count = {result.modified_count}") 
 
 
@@ -851,6 +2573,8 @@ def remove_saved_movie_route(movie_id):
                  
             return jsonify({"error": "Movie not found in saved list"}), 404 
 
+    except CircuitOpenError as e:
+        return unavailable_response(e)
     except OperationFailure as e: 
         logger.error(f"MongoDB Operation Failed in remove_saved_movie_route for user {getattr(current_user, 'email', 'unknown')}: {e}", exc_info=True) 
         return jsonify({"error": "Database operation failed"}), 500 
@@ -859,6 +2583,133 @@ def remove_saved_movie_route(movie_id):
         return jsonify({"error": "Internal server error during removing movie"}), 500 
 
 
-
-
- 
\ No newline at end of file
+@app.cli.command("create-indexes")
+def create_indexes_command():
+    if movies_collection is None:
+        print("Error: movies collection not available, cannot create indexes.")
+        return
+    for index in MOVIE_QUERY_INDEXES:
+        name = movies_collection.create_index(index)
+        print(f"Ensured index {name} on movies")
+    movie_index_catalog.refresh(movies_collection)
+
+
+@app.cli.command("build-similarity-index")
+@click.option("--top-k", default=SIMILARITY_TOP_K, show_default=True, help="Neighbours stored per movie.")
+@click.option("--output", default=SIMILARITY_INDEX_DIR, show_default=True, help="Directory for the .npy files.")
+def build_similarity_index_command(top_k, output):
+    if movies_collection is None:
+        print("Error: movies collection not available, cannot build similarity index.")
+        return
+    movie_docs = movies_collection.find({}, {"genres": 1, "directors": 1, "cast": 1, "year": 1}).batch_size(5000)
+    started = time.monotonic()
+    total = build_similarity_index(movie_docs, top_k, output)
+    print(f"Built similarity index for {total} movies in {time.monotonic() - started:.1f}s at {output}")
+
+
+@app.cli.command("build-embedding-snapshot")
+@click.option("--quantize/--no-quantize", default=False, show_default=True, help="Store int8 vectors with per-row scales.")
+@click.option("--output", default=EMBEDDING_INDEX_DIR, show_default=True, help="Directory for the snapshot files.")
+def build_embedding_snapshot_command(quantize, output):
+    if embedded_movies_collection is None:
+        print("Error: embedded_movies collection not available, cannot build embedding snapshot.")
+        return
+    movie_docs = embedded_movies_collection.find(
+        {"plot_embedding": {"$type": "array"}},
+        {"plot_embedding": 1, "genres": 1, "year": 1}
+    ).batch_size(1000)
+    started = time.monotonic()
+    total, dimensions = build_embedding_snapshot(movie_docs, output, quantize)
+    print(f"Built {'int8' if quantize else 'float32'} embedding snapshot of {total} x {dimensions} in {time.monotonic() - started:.1f}s at {output}")
+
+
+@app.cli.command("export")
+@click.argument("collection_name", type=click.Choice(sorted(EXPORT_PROFILES)))
+@click.option("--format", "fmt", type=click.Choice(sorted(EXPORT_FORMATS)), default="ndjson", show_default=True)
+@click.option("--profile", default="default", show_default=True, help="Projection profile from EXPORT_PROFILES.")
+@click.option("--output", required=True, type=click.Path(dir_okay=False), help="File to write.")
+@click.option("--min-id", default=None, help="Inclusive lower _id bound (for sharded pulls).")
+@click.option("--max-id", default=None, help="Exclusive upper _id bound (for sharded pulls).")
+@click.option("--resume/--no-resume", default=False, show_default=True, help="Continue from OUTPUT.checkpoint.")
+def export_command(collection_name, fmt, profile, output, min_id, max_id, resume):
+    collection = export_collections()[collection_name]
+    if collection is None:
+        print(f"Error: {collection_name} collection not available, cannot export.")
+        return
+    if profile not in EXPORT_PROFILES[collection_name]:
+        raise click.BadParameter(f"must be one of: {', '.join(EXPORT_PROFILES[collection_name])}", param_hint="--profile")
+    fields = EXPORT_PROFILES[collection_name][profile]
+    if fmt == "csv" and fields is None:
+        raise click.BadParameter(f"CSV export needs a fixed-column profile, not '{profile}'", param_hint="--profile")
+    projection = export_projection(collection_name, fields)
+
+    # The checkpoint records the last _id written and the file size at that
+    # point, so a resume truncates any partially written tail before appending.
+    # It also records the export parameters: rows from a different format,
+    # profile or range must never be appended to the same file.
+    try:
+        min_id = parse_export_id("min_id", min_id)
+        max_id = parse_export_id("max_id", max_id)
+    except MovieQueryError as e:
+        raise click.BadParameter(str(e))
+
+    checkpoint_path = output + ".checkpoint"
+    export_params = {
+        "collection": collection_name,
+        "format": fmt,
+        "profile": profile,
+        "min_id": None if min_id is None else str(min_id),
+        "max_id": None if max_id is None else str(max_id),
+    }
+    after_id = None
+    resume_offset = 0
+    if not resume and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        mismatched = [
+            name for name, value in export_params.items()
+            if checkpoint.get("params", {}).get(name) != value
+        ]
+        if mismatched:
+            raise click.ClickException(
+                f"{checkpoint_path} was written with different {', '.join(mismatched)}; "
+                f"rerun with the original options or without --resume"
+            )
+        if not os.path.exists(output) or os.path.getsize(output) < checkpoint["bytes"]:
+            raise click.ClickException(
+                f"{output} is missing or shorter than its checkpoint; rerun without --resume"
+            )
+        after_id = ObjectId(checkpoint["after_id"])
+        resume_offset = checkpoint["bytes"]
+        print(f"Resuming {collection_name} export after {after_id} at byte {resume_offset}")
+
+    def write_checkpoint(last_id, size):
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"after_id": str(last_id), "bytes": size, "params": export_params}, f)
+        os.replace(tmp_path, checkpoint_path)
+
+    started = time.monotonic()
+    exported = 0
+    with open(output, "r+b" if after_id is not None else "wb") as out:
+        if after_id is not None:
+            out.truncate(resume_offset)
+            out.seek(resume_offset)
+        elif fmt == "csv":
+            out.write(export_csv_header(fields).encode("utf-8"))
+
+        last_id = None
+        for doc in iter_export_docs(collection, projection, min_id, max_id, after_id):
+            out.write(format_export_row(doc, fmt, fields).encode("utf-8"))
+            last_id = doc["_id"]
+            exported += 1
+            if exported % EXPORT_CHECKPOINT_EVERY == 0:
+                out.flush()
+                write_checkpoint(last_id, out.tell())
+        out.flush()
+        if last_id is not None:
+            write_checkpoint(last_id, out.tell())
+
+    print(f"Exported {exported} {collection_name} documents to {output} in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,521 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlencode
+from datetime import datetime, timedelta
+
+import bcrypt
+import pymongo
+from bson.objectid import ObjectId
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(REPO_ROOT, "api")
+
+GENRES = [
+    "Drama", "Comedy", "Romance", "Crime", "Thriller", "Action", "Adventure", "Documentary", "Horror",
+    "Mystery", "Biography", "Family", "Fantasy", "Sci-Fi", "History", "Animation", "Music", "War",
+    "Western", "Sport",
+]
+RATINGS = ["G", "PG", "PG-13", "R", "NOT RATED", "UNRATED", "TV-MA", "TV-14"]
+TITLE_WORDS = [
+    "love", "night", "city", "last", "star", "dark", "river", "house", "king", "summer", "blood", "dream",
+    "war", "girl", "man", "road", "secret", "time", "shadow", "winter", "home", "life", "ghost", "fire",
+    "island", "story", "heart", "world", "music", "lost",
+]
+SEARCH_TERMS = ["love", "star", "night", "war", "house"]
+SUGGEST_PREFIXES = ["t", "th", "the l", "lov", "star", "dark ri", "s", "winter h", "ghost", "m"]
+
+BENCH_USER_EMAIL = "bench@example.com"
+BENCH_USER_PASSWORD = "bench-password"
+# Seeded _ids start here and grow by one second per document, like real inserts.
+SEED_ID_EPOCH = 1262304000
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def seeded_object_id(rnd, position):
+    return ObjectId(f"{SEED_ID_EPOCH + position:08x}{rnd.getrandbits(64):016x}")
+
+
+def random_title(rnd):
+    words = rnd.sample(TITLE_WORDS, rnd.randint(1, 4))
+    title = " ".join(word.capitalize() for word in words)
+    return ("The " + title) if rnd.random() < 0.2 else title
+
+
+def generate_movies(rnd, count):
+    base_date = datetime(1900, 1, 1)
+    for position in range(count):
+        year = rnd.randint(1900, 2016)
+        yield {
+            "_id": seeded_object_id(rnd, position),
+            "title": random_title(rnd),
+            "year": year,
+            "released": base_date + timedelta(days=(year - 1900) * 365 + rnd.randint(0, 364)),
+            "runtime": rnd.randint(60, 200),
+            "rated": rnd.choice(RATINGS),
+            "type": "series" if rnd.random() < 0.05 else "movie",
+            "genres": rnd.sample(GENRES, rnd.randint(1, 3)),
+            "directors": [f"Director {rnd.randint(0, 8000)}"],
+            "cast": [f"Actor {int(rnd.paretovariate(1.2)) % 40000}" for _ in range(4)],
+            "plot": " ".join(rnd.choice(TITLE_WORDS) for _ in range(25)),
+            "poster": f"https://m.media-amazon.com/images/M/{rnd.getrandbits(48):x}.jpg",
+            "imdb": {
+                "rating": round(rnd.uniform(1.5, 9.5), 1),
+                "votes": int(rnd.lognormvariate(7, 2)),
+                "id": rnd.randint(1, 9999999),
+            },
+        }
+
+
+def generate_comments(rnd, movie_ids, count):
+    now = datetime(2016, 1, 1)
+    for position in range(count):
+        # Pareto-skewed so a few movies carry long comment threads, like the real data.
+        movie_id = movie_ids[min(int(rnd.paretovariate(1.1)) - 1, len(movie_ids) - 1)]
+        user_number = rnd.randint(0, 5000)
+        yield {
+            "_id": seeded_object_id(rnd, position),
+            "movie_id": movie_id,
+            "name": f"User {user_number}",
+            "email": f"user{user_number}@example.com",
+            "text": " ".join(rnd.choice(TITLE_WORDS) for _ in range(rnd.randint(5, 60))),
+            "date": now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365 * 30)),
+        }
+
+
+def insert_in_batches(collection, docs, batch_size=5000):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def seed_dataset(client, args):
+    rnd = random.Random(args.random_seed)
+    sample_mflix = client["sample_mflix"]
+    users_db = client["movies_db"]
+    for collection in (sample_mflix["movies"], sample_mflix["comments"], sample_mflix["embedded_movies"], users_db["users"]):
+        collection.drop()
+
+    started = time.monotonic()
+    movies = list(generate_movies(rnd, args.movies))
+    insert_in_batches(sample_mflix["movies"], movies)
+    movie_ids = [movie["_id"] for movie in movies]
+    rnd.shuffle(movie_ids)
+    insert_in_batches(sample_mflix["comments"], generate_comments(rnd, movie_ids, args.comments))
+
+    embedded = []
+    for movie in movies[:args.embedded_movies]:
+        vector = [rnd.gauss(0, 1) for _ in range(args.embedding_dims)]
+        embedded.append({**movie, "plot_embedding": vector})
+    insert_in_batches(sample_mflix["embedded_movies"], embedded, batch_size=500)
+
+    # Only the bench user needs a real hash at the production cost; the others never log in.
+    users = [{
+        "_id": seeded_object_id(rnd, 0),
+        "email": BENCH_USER_EMAIL,
+        "password": bcrypt.hashpw(BENCH_USER_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8"),
+        "name": "Bench User",
+        "username": BENCH_USER_EMAIL,
+        "created_at": datetime.utcnow(),
+        "saved_movie_ids": rnd.sample(movie_ids, min(args.saved_per_user, len(movie_ids))),
+    }]
+    for number in range(args.users - 1):
+        users.append({
+            "_id": seeded_object_id(rnd, number + 1),
+            "email": f"user{number}@example.com",
+            "password": "not-a-real-hash",
+            "name": f"User {number}",
+            "username": f"user{number}@example.com",
+            "created_at": datetime.utcnow(),
+            "saved_movie_ids": rnd.sample(movie_ids, min(args.saved_per_user, len(movie_ids))),
+        })
+    insert_in_batches(users_db["users"], users, batch_size=100)
+    print(f"Seeded {len(movies)} movies, {args.comments} comments, {len(embedded)} embedded movies, "
+          f"{len(users)} users in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+
+def load_app(args):
+    os.environ.setdefault("FLASK_SECRET_KEY", "bench-secret")
+    if args.backend == "mongomock":
+        import mongomock
+        mock_client = mongomock.MongoClient()
+        pymongo.MongoClient = lambda *client_args, **client_kwargs: mock_client
+        os.environ["MONGODB_URI"] = "mongodb://mongomock"
+        seed_dataset(mock_client, args)
+    else:
+        os.environ["MONGODB_URI"] = args.uri
+        if args.seed:
+            seed_dataset(pymongo.MongoClient(args.uri), args)
+
+    sys.path.insert(0, API_DIR)
+    import index
+
+    # Bench clients talk plain HTTP, so the session cookie cannot be Secure.
+    index.app.config["SESSION_COOKIE_SECURE"] = False
+    if not args.verbose:
+        index.app.logger.setLevel("ERROR")
+    if not args.with_rate_limits:
+        unlimited = {group: (10 ** 9, 10 ** 9) for group in index.RATE_LIMITS}
+        index.rate_limiter = index.RateLimiter(index.MemoryRateLimitBackend(index.RATE_LIMIT_MAX_KEYS), unlimited)
+    if args.backend == "mongomock" or args.seed:
+        for index_keys in index.MOVIE_QUERY_INDEXES:
+            index.movies_collection.create_index(index_keys)
+    index.movie_index_catalog.refresh(index.movies_collection)
+
+    data_dir = tempfile.mkdtemp(prefix="mflix-bench-")
+    index.build_similarity_index(
+        index.movies_collection.find({}, {"genres": 1, "directors": 1, "cast": 1, "year": 1}),
+        index.SIMILARITY_TOP_K, os.path.join(data_dir, "similarity")
+    )
+    index.similarity_index = index.SimilarityIndex.load(os.path.join(data_dir, "similarity"))
+    if index.embedded_movies_collection.count_documents({}) > 0:
+        index.build_embedding_snapshot(
+            index.embedded_movies_collection.find({"plot_embedding": {"$type": "array"}}, {"plot_embedding": 1, "genres": 1, "year": 1}),
+            os.path.join(data_dir, "embeddings"), args.quantize
+        )
+        index.embedding_index = index.EmbeddingIndex.load(os.path.join(data_dir, "embeddings"))
+    index.title_suggest_index.refresh(index.movies_collection)
+    return index
+
+
+class Scenario:
+
+    def __init__(self, name, build, auth=False, max_requests=None, setup=None):
+        self.name = name
+        self.build = build
+        self.auth = auth
+        self.max_requests = max_requests
+        # Request run on the same transport right before each timed one. It is left
+        # out of the latencies but not out of wall time, so throughput includes it.
+        self.setup = setup
+
+
+def url(path, **params):
+    return f"{path}?{urlencode(params)}"
+
+
+def login_request():
+    return "POST", "/api/login", {"email": BENCH_USER_EMAIL, "password": BENCH_USER_PASSWORD}
+
+
+def build_scenarios(movie_ids, embedded_ids, backend):
+    def pick(ids, i):
+        return ids[i % len(ids)]
+
+    # Every register request needs a fresh email, across warmup, modes and reruns against one mongod.
+    register_run = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    register_numbers = itertools.count()
+
+    def register_request(i):
+        email = f"bench-{register_run}-{next(register_numbers)}@example.com"
+        return "POST", "/api/register", {"email": email, "password": BENCH_USER_PASSWORD, "name": "Bench Register"}
+
+    scenarios = [
+        Scenario("movies_page", lambda i: ("GET", url("/api/movies", page=1 + i % 5), None)),
+        Scenario("movies_search", lambda i: ("GET", url("/api/movies", search=SEARCH_TERMS[i % len(SEARCH_TERMS)]), None)),
+        Scenario("movies_sorted_filtered", lambda i: ("GET", url("/api/movies", sort="rating", genres=GENRES[i % 5], year_min=1990), None)),
+        Scenario("movie_detail", lambda i: ("GET", f"/api/movies/{pick(movie_ids, i)}", None)),
+        Scenario("featured", lambda i: ("GET", "/api/movies/featured", None)),
+        Scenario("comments", lambda i: ("GET", url("/api/comments", movieId=pick(movie_ids, i)), None)),
+        Scenario("similar", lambda i: ("GET", f"/api/movies/{pick(movie_ids, i)}/similar", None)),
+        Scenario("suggest", lambda i: ("GET", url("/api/movies/suggest", prefix=SUGGEST_PREFIXES[i % len(SUGGEST_PREFIXES)]), None)),
+        Scenario("register", register_request),
+        Scenario("login", lambda i: login_request()),
+        Scenario("logout", lambda i: ("POST", "/api/logout", None), setup=lambda i: login_request()),
+        Scenario("me", lambda i: ("GET", "/api/me", None), auth=True),
+        Scenario("saved_movies", lambda i: ("GET", "/api/users/me/movies", None), auth=True),
+        Scenario("save_movie", lambda i: ("POST", "/api/users/me/movies", {"movie_id": str(pick(movie_ids, i))}), auth=True),
+        Scenario("remove_saved_movie", lambda i: ("DELETE", f"/api/users/me/movies/{pick(movie_ids, i)}", None), auth=True,
+                 setup=lambda i: ("POST", "/api/users/me/movies", {"movie_id": str(pick(movie_ids, i))})),
+        Scenario("add_comment", lambda i: ("POST", "/api/comments", {"movie_id": str(pick(movie_ids, i)), "text": "bench comment"}), auth=True),
+        Scenario("export_comments", lambda i: ("GET", "/api/export/comments", None), auth=True, max_requests=3),
+        Scenario("export_shards", lambda i: ("GET", url("/api/export/comments/shards", count=4), None), auth=True),
+        Scenario("metrics", lambda i: ("GET", "/api/metrics", None)),
+    ]
+    skipped = {}
+    if embedded_ids:
+        scenarios.insert(7, Scenario("semantic_like", lambda i: ("GET", url("/api/movies/semantic", like=pick(embedded_ids, i)), None)))
+        if os.getenv("OPENAI_API_KEY"):
+            scenarios.insert(8, Scenario("semantic_text", lambda i: ("GET", url("/api/movies/semantic", q=SEARCH_TERMS[i % len(SEARCH_TERMS)]), None)))
+        else:
+            skipped["semantic_text"] = "OPENAI_API_KEY is not set, so q= queries cannot be embedded"
+    else:
+        skipped["semantic_like"] = skipped["semantic_text"] = "no embedding snapshot was built"
+    if backend == "mongomock":
+        scenarios = [scenario for scenario in scenarios if scenario.name != "export_shards"]
+        skipped["export_shards"] = "mongomock does not implement $bucketAuto"
+    return scenarios, skipped
+
+
+class TestClientTransport:
+    name = "test_client"
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        data = response.get_data()
+        response.close()
+        return response.status_code, len(data)
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    name = "wsgi"
+
+    def __init__(self, host, port):
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+
+    def request(self, method, path, body):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        self.connection.request(method, path, body=payload, headers=headers)
+        response = self.connection.getresponse()
+        data = response.read()
+        for header in response.headers.get_all("Set-Cookie") or []:
+            name, _, value = header.split(";", 1)[0].partition("=")
+            self.cookies[name.strip()] = value
+        return response.status, len(data)
+
+    def close(self):
+        self.connection.close()
+
+
+def start_wsgi_server(app):
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *log_args, **log_kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(scenario, make_transport, total_requests, concurrency, warmup):
+    if scenario.max_requests is not None:
+        total_requests = min(total_requests, scenario.max_requests)
+    concurrency = max(1, min(concurrency, total_requests))
+    transports = [make_transport() for _ in range(concurrency)]
+    if scenario.auth:
+        for transport in transports:
+            status, _ = transport.request(*login_request())
+            if status != 200:
+                raise RuntimeError(f"Bench login failed with status {status}")
+    for i in range(warmup):
+        if scenario.setup is not None:
+            transports[0].request(*scenario.setup(i))
+        method, path, body = scenario.build(i)
+        transports[0].request(method, path, body)
+
+    latencies = []
+    sizes = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+    counter_lock = threading.Lock()
+
+    def worker(transport):
+        local_latencies = []
+        local_sizes = []
+        local_statuses = {}
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            if scenario.setup is not None:
+                transport.request(*scenario.setup(i))
+            method, path, body = scenario.build(i)
+            started = time.perf_counter()
+            status, size = transport.request(method, path, body)
+            local_latencies.append(time.perf_counter() - started)
+            local_sizes.append(size)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            sizes.extend(local_sizes)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(transport,)) for transport in transports]
+    wall_started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - wall_started
+    for transport in transports:
+        transport.close()
+
+    latencies.sort()
+    return {
+        "scenario": scenario.name,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds > 0 else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "bytes_per_response": round(sum(sizes) / len(sizes), 1),
+        "status_counts": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(row["mode"], row["scenario"]): row for row in baseline["results"]}
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit')}):", file=sys.stderr)
+    for row in results:
+        before = previous.get((row["mode"], row["scenario"]))
+        if before is None:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (row[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            deltas.append(f"{key[:-3]} {before[key]:.2f}->{row[key]:.2f}ms ({change:+.0f}%)")
+        print(f"  {row['mode']:<11} {row['scenario']:<24} " + "  ".join(deltas), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic sample_mflix dataset and benchmark every API route.")
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock",
+                        help="mongomock needs no server but is not thread-safe, so it only runs at concurrency 1.")
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="MongoDB URI for --backend mongod.")
+    parser.add_argument("--seed", action="store_true",
+                        help="With --backend mongod, DROP and reseed sample_mflix.{movies,comments,embedded_movies} and movies_db.users.")
+    parser.add_argument("--movies", type=int, default=23000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--embedded-movies", type=int, default=3500)
+    parser.add_argument("--embedding-dims", type=int, default=1536)
+    parser.add_argument("--quantize", action="store_true", help="Benchmark the int8 embedding snapshot.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--saved-per-user", type=int, default=2000)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario and mode.")
+    parser.add_argument("--concurrency", type=int, nargs="+", help="Default: 1 with mongomock, 1 and 8 with mongod.")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", choices=["test_client", "wsgi"], default=["test_client", "wsgi"])
+    parser.add_argument("--scenarios", nargs="+", help="Only run these scenarios.")
+    parser.add_argument("--with-rate-limits", action="store_true", help="Keep the API's per-client rate limits on.")
+    parser.add_argument("--output", help="JSON report path (default: bench/results/<commit>.json).")
+    parser.add_argument("--compare", help="Earlier JSON report to print latency deltas against.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the API's request logging on.")
+    args = parser.parse_args()
+    if args.concurrency is None:
+        args.concurrency = [1] if args.backend == "mongomock" else [1, 8]
+    if args.backend == "mongomock" and max(args.concurrency) > 1:
+        parser.error("mongomock is not thread-safe; use --backend mongod for --concurrency > 1")
+
+    index = load_app(args)
+    movie_ids = [doc["_id"] for doc in index.movies_collection.find({}, {"_id": 1}).limit(2000)]
+    embedded_ids = []
+    if index.embedding_index is not None:
+        embedded_ids = [doc["_id"] for doc in index.embedded_movies_collection.find({}, {"_id": 1}).limit(2000)]
+    scenarios, skipped = build_scenarios(movie_ids, embedded_ids, args.backend)
+    if args.scenarios:
+        scenarios = [scenario for scenario in scenarios if scenario.name in args.scenarios]
+        skipped = {name: reason for name, reason in skipped.items() if name in args.scenarios}
+    for name, reason in skipped.items():
+        print(f"Skipping {name}: {reason}", file=sys.stderr)
+
+    server = start_wsgi_server(index.app) if "wsgi" in args.modes else None
+    transports = {
+        "test_client": lambda: TestClientTransport(index.app),
+        "wsgi": lambda: HTTPTransport("127.0.0.1", server.server_port),
+    }
+
+    results = []
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            for scenario in scenarios:
+                row = run_scenario(scenario, transports[mode], args.requests, concurrency, args.warmup)
+                row["mode"] = mode
+                results.append(row)
+                print(f"{mode:<11} c={row['concurrency']:<3} {scenario.name:<24} p50 {row['p50_ms']:>9.2f}ms  "
+                      f"p95 {row['p95_ms']:>9.2f}ms  p99 {row['p99_ms']:>9.2f}ms  {row['throughput_rps']:>9.1f} req/s  "
+                      f"{row['bytes_per_response']:>11.0f} B  {row['status_counts']}", file=sys.stderr)
+    if server is not None:
+        server.shutdown()
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "dataset": {
+                "movies": args.movies,
+                "comments": args.comments,
+                "embedded_movies": args.embedded_movies,
+                "embedding_dims": args.embedding_dims,
+                "users": args.users,
+                "saved_per_user": args.saved_per_user,
+                "random_seed": args.random_seed,
+            },
+            "requests_per_scenario": args.requests,
+            "warmup": args.warmup,
+            "rate_limits": args.with_rate_limits,
+            "skipped_scenarios": skipped,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(REPO_ROOT, "bench", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import mongomock
+import pymongo
+import pytest
+
+# api/index.py connects at import time; point it at an in-process mongomock
+# client so the unit tests need no server.
+os.environ.setdefault("FLASK_SECRET_KEY", "test-secret")
+os.environ["MONGODB_URI"] = "mongodb://mongomock"
+_mock_client = mongomock.MongoClient()
+pymongo.MongoClient = lambda *args, **kwargs: _mock_client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api"))
+
+import index  # noqa: E402
+
+
+class FakeClock:
+
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(index.time, "monotonic", fake)
+    return fake
@@ -0,0 +1,110 @@
+import pytest
+from pymongo.errors import AutoReconnect, DuplicateKeyError, ExecutionTimeout
+
+from index import CircuitBreaker, CircuitOpenError
+
+
+def make_breaker():
+    return CircuitBreaker(window_seconds=30, min_requests=4, error_rate=0.5, cooldown_seconds=15)
+
+
+def fail(error):
+    def fn():
+        raise error
+    return fn
+
+
+def trip(breaker):
+    for _ in range(4):
+        with pytest.raises(AutoReconnect):
+            breaker.call(fail(AutoReconnect("down")))
+    assert breaker.stats()["state"] == "open"
+
+
+def test_opens_once_error_rate_is_reached(clock):
+    breaker = make_breaker()
+    breaker.call(lambda: "ok")
+    breaker.call(lambda: "ok")
+    with pytest.raises(AutoReconnect):
+        breaker.call(fail(AutoReconnect("down")))
+    assert breaker.stats()["state"] == "closed"
+    with pytest.raises(ExecutionTimeout):
+        breaker.call(fail(ExecutionTimeout("slow")))
+
+    stats = breaker.stats()
+    assert stats["state"] == "open"
+    assert stats["trips"] == 1
+
+
+def test_stays_closed_below_min_requests(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        with pytest.raises(AutoReconnect):
+            breaker.call(fail(AutoReconnect("down")))
+    assert breaker.stats()["state"] == "closed"
+
+
+def test_caller_errors_do_not_count_as_failures(clock):
+    breaker = make_breaker()
+    for _ in range(10):
+        with pytest.raises(DuplicateKeyError):
+            breaker.call(fail(DuplicateKeyError("dup")))
+    stats = breaker.stats()
+    assert stats["state"] == "closed"
+    assert stats["window_failures"] == 0
+
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        with pytest.raises(AutoReconnect):
+            breaker.call(fail(AutoReconnect("down")))
+    clock.advance(31)
+    breaker.call(lambda: "ok")
+    assert breaker.stats()["window_requests"] == 1
+    assert breaker.stats()["state"] == "closed"
+
+
+def test_open_breaker_rejects_with_retry_after(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(5)
+    calls = []
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+    assert excinfo.value.retry_after == 10
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(15)
+
+    def probe():
+        # While the probe runs, everyone else is still rejected.
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "second")
+        assert breaker.stats()["state"] == "half_open"
+        return "probed"
+
+    assert breaker.call(probe) == "probed"
+    assert breaker.stats()["state"] == "closed"
+    assert breaker.stats()["window_requests"] == 0
+
+
+def test_failed_probe_reopens_for_a_full_cooldown(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(15)
+    with pytest.raises(AutoReconnect):
+        breaker.call(fail(AutoReconnect("still down")))
+    assert breaker.stats()["state"] == "open"
+
+    clock.advance(14)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+    clock.advance(1)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.stats()["state"] == "closed"
@@ -0,0 +1,56 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from index import MOVIE_QUERY_INDEXES, MovieQueryError, app, build_movies_filter, plan_movies_query
+
+
+def build_filter(**args):
+    with app.test_request_context(query_string=args):
+        return build_movies_filter(MultiDict(args))
+
+
+def test_plain_sort_uses_single_field_index():
+    assert plan_movies_query(set(), "imdb.rating", MOVIE_QUERY_INDEXES) == [("imdb.rating", -1)]
+
+
+def test_equality_filter_prefers_compound_index():
+    assert plan_movies_query({"genres"}, "year", MOVIE_QUERY_INDEXES) == [("genres", 1), ("year", -1)]
+    assert plan_movies_query({"type"}, "imdb.rating", MOVIE_QUERY_INDEXES) == [("type", 1), ("imdb.rating", -1)]
+
+
+def test_unpinned_prefix_falls_back_to_sort_field_index():
+    # rated only has a compound index for rating, so a year sort walks year_-1
+    # and filters rated on the fetched documents.
+    assert plan_movies_query({"rated"}, "year", MOVIE_QUERY_INDEXES) == [("year", -1)]
+
+
+def test_missing_index_is_refused():
+    assert plan_movies_query(set(), "title", [[("year", -1)]]) is None
+    assert plan_movies_query({"genres"}, "released", []) is None
+
+
+def test_only_existing_indexes_are_planned():
+    available = [[("imdb.rating", -1)]]
+    assert plan_movies_query({"genres"}, "imdb.rating", available) == [("imdb.rating", -1)]
+
+
+def test_filter_marks_equality_fields():
+    query, equality_fields = build_filter(genres="Drama,Comedy", type="movie", year_min="1990", rating_min="7")
+    assert query["genres"] == {"$in": ["Drama", "Comedy"]}
+    assert query["year"] == {"$gte": 1990}
+    assert query["imdb.rating"] == {"$gte": 7.0}
+    assert equality_fields == {"genres", "type"}
+
+
+@pytest.mark.parametrize("args, message", [
+    ({"genres": "A,B,C,D,E,F"}, "At most"),
+    ({"genres_match": "some"}, "genres_match"),
+    ({"year_min": "2000", "year_max": "1990"}, "cannot be greater"),
+    ({"year_min": "nineteen"}, "must be an integer"),
+    ({"year_min": "99999999999999999999999"}, "out of range"),
+    ({"rating_min": "nan"}, "finite"),
+    ({"rating_min": "inf"}, "finite"),
+])
+def test_invalid_filters_are_rejected(args, message):
+    with pytest.raises(MovieQueryError, match=message):
+        build_filter(**args)
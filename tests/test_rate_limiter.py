@@ -0,0 +1,77 @@
+from index import CircuitOpenError, MemoryRateLimitBackend, RateLimiter
+
+LIMITS = {"auth": (5, 0.2), "search": (20, 5.0)}
+
+
+class BrokenBackend:
+
+    def __init__(self, error):
+        self.error = error
+
+    def take(self, key, capacity, refill_per_second):
+        raise self.error
+
+
+def test_burst_up_to_capacity_then_reject(clock):
+    limiter = RateLimiter(MemoryRateLimitBackend(100), LIMITS)
+    assert all(limiter.check("auth", "ip:1")[0] for _ in range(5))
+    allowed, retry_after = limiter.check("auth", "ip:1")
+    assert not allowed
+    # 0.2 tokens per second: one token is 5 seconds away.
+    assert retry_after == 5
+    assert limiter.stats()["rejected"]["auth"] == 1
+
+
+def test_tokens_refill_over_time(clock):
+    limiter = RateLimiter(MemoryRateLimitBackend(100), LIMITS)
+    for _ in range(5):
+        limiter.check("auth", "ip:1")
+
+    clock.advance(2.5)
+    allowed, retry_after = limiter.check("auth", "ip:1")
+    assert not allowed
+    assert retry_after == 3
+
+    clock.advance(2.5)
+    assert limiter.check("auth", "ip:1") == (True, 0)
+    assert not limiter.check("auth", "ip:1")[0]
+
+
+def test_refill_is_capped_at_capacity(clock):
+    limiter = RateLimiter(MemoryRateLimitBackend(100), LIMITS)
+    limiter.check("auth", "ip:1")
+    clock.advance(3600)
+    assert sum(limiter.check("auth", "ip:1")[0] for _ in range(10)) == 5
+
+
+def test_retry_after_is_at_least_one_second(clock):
+    limiter = RateLimiter(MemoryRateLimitBackend(100), LIMITS)
+    for _ in range(20):
+        limiter.check("search", "ip:1")
+    allowed, retry_after = limiter.check("search", "ip:1")
+    assert not allowed
+    assert retry_after == 1
+
+
+def test_clients_and_groups_have_separate_buckets(clock):
+    limiter = RateLimiter(MemoryRateLimitBackend(100), LIMITS)
+    for _ in range(5):
+        limiter.check("auth", "ip:1")
+    assert limiter.check("auth", "ip:2")[0]
+    assert limiter.check("search", "ip:1")[0]
+
+
+def test_memory_backend_evicts_least_recently_used(clock):
+    backend = MemoryRateLimitBackend(2)
+    backend.take("a", 1, 0.001)
+    backend.take("b", 1, 0.001)
+    backend.take("a", 1, 0.001)
+    backend.take("c", 1, 0.001)
+    assert list(backend._buckets) == ["a", "c"]
+
+
+def test_broken_backend_falls_back_to_memory(clock):
+    limiter = RateLimiter(BrokenBackend(CircuitOpenError(15)), LIMITS, fallback=MemoryRateLimitBackend(100))
+    assert all(limiter.check("auth", "ip:1")[0] for _ in range(5))
+    assert not limiter.check("auth", "ip:1")[0]
+    assert limiter.stats()["fallbacks"] == 6
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from index import SingleFlight
+
+
+def run_concurrently(flight, fn, callers):
+    results = [None] * callers
+    errors = [None] * callers
+
+    def call(position):
+        try:
+            results[position] = flight.do("movies", {"page": 1}, fn)
+        except Exception as e:
+            errors[position] = e
+
+    threads = [threading.Thread(target=call, args=(position,)) for position in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def wait_for_followers(flight, callers):
+    # Followers are registered as coalesced before they block on the leader.
+    for _ in range(1000):
+        if flight.stats()["coalesced_total"] == callers - 1:
+            return
+        threading.Event().wait(0.001)
+    raise AssertionError("followers never joined the in-flight call")
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def fn():
+        executions.append(1)
+        release.wait(5)
+        return {"movies": ["a"]}
+
+    threads, results, errors = run_concurrently(flight, fn, 5)
+    wait_for_followers(flight, 5)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1
+    assert errors == [None] * 5
+    assert all(result == {"movies": ["a"]} for result in results)
+    stats = flight.stats()
+    assert stats["executed_total"] == 1
+    assert stats["coalesced_total"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_error_reaches_every_waiting_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise RuntimeError("query failed")
+
+    threads, results, errors = run_concurrently(flight, fn, 4)
+    wait_for_followers(flight, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert flight.stats()["routes"]["movies"]["errors"] == 1
+
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do("movies", {"page": 1}, fn) == 1
+    assert flight.do("movies", {"page": 1}, fn) == 2
+
+
+def test_a_failed_call_does_not_poison_the_next_one():
+    flight = SingleFlight()
+
+    with pytest.raises(RuntimeError):
+        flight.do("movies", {"page": 1}, lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert flight.do("movies", {"page": 1}, lambda: "ok") == "ok"
+
+
+def test_keys_differ_by_route_and_params():
+    assert SingleFlight.make_key("movies", page=1) != SingleFlight.make_key("movies", page=2)
+    assert SingleFlight.make_key("movies", page=1) != SingleFlight.make_key("comments", page=1)
+    assert SingleFlight.make_key("movies", a=1, b=2) == SingleFlight.make_key("movies", b=2, a=1)